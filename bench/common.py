@@ -0,0 +1,87 @@
+import os
+import resource
+import socket
+import statistics
+import sys
+import tempfile
+
+# Shared setup of the benchmarks that run the bot against the stand-in server (see stand_in.py)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, "..", "src")
+# Directory the benchmark was started from, the process changes into a temporary directory
+WORKING_DIR = os.getcwd()
+
+
+def prepare_environment() -> str:
+    # Has to run before the modules of the bot are imported, they read the environment on import.
+    # Worker processes run this again and get the same values from the environment of the main process.
+    sys.path.insert(0, SRC_DIR)
+    if not os.getenv("BENCH_TMP_DIR"):
+        os.environ["BENCH_TMP_DIR"] = tempfile.mkdtemp(prefix="bench-")
+    tmp_dir = os.environ["BENCH_TMP_DIR"]
+    if not os.getenv("BENCH_STAND_IN_PORT"):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            os.environ["BENCH_STAND_IN_PORT"] = str(sock.getsockname()[1])
+    stand_in_url = f"http://127.0.0.1:{os.environ['BENCH_STAND_IN_PORT']}"
+
+    # Never talk to the real services. BENCH_DATABASE_URL can point at a scratch database, never the production one
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL") or f"sqlite+aiosqlite:///{tmp_dir}/bench.db"
+    os.environ["GW2_API_URL"] = stand_in_url
+    os.environ["DPS_REPORT_URL"] = stand_in_url
+    os.environ["SNOWCROWS_URL"] = stand_in_url
+    os.environ["LOG_CACHE_DIR"] = os.path.join(tmp_dir, "log-cache")
+    # The Snow Crows rate limit would hide the time spent in the bot
+    os.environ.setdefault("SC_REQUESTS_PER_SECOND", "1000")
+    # The http cache of the API client is created in the working directory
+    os.chdir(tmp_dir)
+    return stand_in_url
+
+
+def get_stand_in_port() -> int:
+    return int(os.environ["BENCH_STAND_IN_PORT"])
+
+
+def get_path(path: str) -> str:
+    # Paths on the command line are relative to the directory the benchmark was started from
+    return os.path.join(WORKING_DIR, path)
+
+
+def summarize(values: list) -> dict | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "min": round(values[0], 3),
+        "median": round(statistics.median(values), 3),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def get_peak_rss_kb() -> int:
+    # Highest RSS of the whole process since the start, it never goes down
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def get_memory_status(key: str) -> int | None:
+    # VmRSS or VmHWM of /proc/self/status in KB, None where there is no /proc
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith(f"{key}:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> int | None:
+    # Resets the peak RSS (VmHWM) to the current RSS and returns it, None if the kernel doesn't support it
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return None
+    return get_memory_status("VmRSS")
@@ -0,0 +1,138 @@
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Seeds a throwaway database and times the log and application lookups without and with the indexes.
+# Usage: python bench/db_indexes.py [--rows 100000] [--repeat 50]
+# Uses DATABASE_URL if it is set, otherwise a temporary sqlite database. Never point it at the production database.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from sqlalchemy import desc, distinct, func, insert, select, text
+from database import engine, init_db
+import models.stats, models.build, models.equipment, models.item
+from migrations import add_missing_indexes
+from models.application import Application
+from models.enums.application_status import ApplicationStatus
+from models.enums.log_status import LogStatus
+from models.enums.pools import BossLogPool
+from models.enums.role import Role
+from models.log import Log
+
+USERS = 5000
+ENCOUNTERS = 30
+
+
+def get_queries(user_id: int, log_url: str):
+    # Same filters as check_log, get_progress_embed, SubmitLogModal, LogReviewModal, apply_t1 and on_ready
+    return {
+        "duplicate log": select(Log.id).where(Log.log_url == log_url).where(Log.discord_user_id == user_id)
+            .where(Log.status != LogStatus.DENIED),
+        "duplicate boss": select(Log.id).where(Log.discord_user_id == user_id)
+            .where(Log.status != LogStatus.DENIED).where(Log.status != LogStatus.REVIEW_DENIED)
+            .where(Log.encounter_id == 7).where(Log.tier == 3).where(Log.role == Role.HEAL),
+        "boss pools": select(Log.assigned_pool).where(Log.discord_user_id == user_id)
+            .where(Log.status != LogStatus.DENIED).where(Log.status != LogStatus.REVIEW_DENIED).where(Log.tier == 3),
+        "progress": select(Log.id).where(Log.discord_user_id == user_id).where(Log.status != LogStatus.DENIED)
+            .where(Log.tier == 2).order_by(desc(Log.status)),
+        "active logs": select(func.count(Log.id)).where(Log.discord_user_id == user_id)
+            .where((Log.status == LogStatus.WAITING_FOR_REVIEW) | (Log.status == LogStatus.REVIEW_ACCEPTED)),
+        "role count": select(func.count(Log.id)).where(Log.discord_user_id == user_id)
+            .where(Log.status == LogStatus.REVIEW_ACCEPTED).where(Log.tier == 3).where(Log.role == Role.HEAL),
+        "t3 bosses": select(func.count(distinct(Log.encounter_id))).where(Log.discord_user_id == user_id)
+            .where(Log.status == LogStatus.REVIEW_ACCEPTED).where(Log.tier == 3),
+        "pending logs": select(Log.id).where(Log.status == LogStatus.WAITING_FOR_REVIEW),
+        "open application": select(Application.id).where(Application.discord_user_id == user_id)
+            .where(Application.status == ApplicationStatus.WAITING_FOR_REVIEW),
+        "pending applications": select(Application.id).where(Application.status == ApplicationStatus.WAITING_FOR_REVIEW),
+    }
+
+
+async def seed(rows: int):
+    now = datetime.datetime.utcnow()
+    # Most logs and applications are handled already, a few are waiting for a review
+    log_statuses = [LogStatus.DENIED, LogStatus.REVIEW_DENIED] + [LogStatus.REVIEW_ACCEPTED] * 6 + [LogStatus.WAITING_FOR_REVIEW]
+    application_statuses = [ApplicationStatus.ACCEPTED, ApplicationStatus.DENIED, ApplicationStatus.NO_REVIEW_REQUESTED,
+                            ApplicationStatus.CLOSED_BY_APPLICANT, ApplicationStatus.REVIEW_ACCEPTED,
+                            ApplicationStatus.REVIEW_DENIED] * 3 + [ApplicationStatus.WAITING_FOR_REVIEW]
+    async with engine.begin() as conn:
+        for start in range(0, rows, 10000):
+            count = min(10000, rows - start)
+            await conn.execute(insert(Log), [{
+                "discord_user_id": random.randrange(USERS),
+                "tier": random.choice((2, 3)),
+                "role": random.choice(list(Role)),
+                "log_url": f"https://dps.report/bench-{start + i}",
+                "encounter_id": random.randrange(ENCOUNTERS),
+                "fight_name": "Bench",
+                "is_cm": False,
+                "assigned_pool": random.choice(list(BossLogPool)),
+                "status": random.choice(log_statuses),
+                "submitted_at": now,
+            } for i in range(count)])
+            await conn.execute(insert(Application), [{
+                "discord_user_id": random.randrange(USERS),
+                "status": random.choice(application_statuses),
+                "time_created": now,
+                "account_name": "Bench.1234",
+                "character_name": "Bench",
+            } for _ in range(count)])
+
+
+async def drop_indexes():
+    async with engine.begin() as conn:
+        for table in [Log.__table__, Application.__table__]:
+            for index in table.indexes:
+                await conn.run_sync(lambda sync_conn: index.drop(sync_conn, checkfirst=True))
+
+
+async def analyze():
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+
+
+async def measure(repeat: int, rows: int):
+    timings = {}
+    async with engine.connect() as conn:
+        for _ in range(repeat):
+            user_id = random.randrange(USERS)
+            log_url = f"https://dps.report/bench-{random.randrange(rows)}"
+            for name, stmt in get_queries(user_id, log_url).items():
+                start = time.perf_counter()
+                (await conn.execute(stmt)).all()
+                timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+    return {name: statistics.median(values) for name, values in timings.items()}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000, help="Number of logs and of applications")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    await init_db()
+    await drop_indexes()
+    print(f"Seeding {args.rows} logs and {args.rows} applications into {engine.url.render_as_string()}")
+    await seed(args.rows)
+    await analyze()
+    before = await measure(args.repeat, args.rows)
+
+    await add_missing_indexes()
+    await analyze()
+    after = await measure(args.repeat, args.rows)
+
+    print(f"{'query':<22}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in before:
+        print(f"{name:<22}{before[name]:>12.3f}{after[name]:>12.3f}{before[name] / after[name]:>9.1f}x")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
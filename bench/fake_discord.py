@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+from typing import Dict, List
+import discord
+
+# Just enough of discord.py for the views, modals and cogs to run without a gateway connection.
+# Everything the bot sends is kept on the fake objects so a driver can look at the result.
+
+snowflakes = itertools.count(10 ** 17)
+
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.name = f"Role {role_id}"
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeMessage:
+    def __init__(self, channel: "FakeChannel | None", content: str = None, embed: discord.Embed = None,
+                 view: discord.ui.View = None):
+        self.id = next(snowflakes)
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.deleted = False
+        self.jump_url = f"https://discord.com/channels/@me/{channel.id if channel else 0}/{self.id}"
+
+    async def edit(self, **kwargs) -> "FakeMessage":
+        for key in ("content", "embed", "view"):
+            if key in kwargs:
+                setattr(self, key, kwargs[key])
+        return self
+
+    async def delete(self):
+        self.deleted = True
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.messages: Dict[int, FakeMessage] = {}
+
+    async def send(self, content: str = None, *, embed: discord.Embed = None, view: discord.ui.View = None,
+                   **kwargs) -> FakeMessage:
+        message = FakeMessage(self, content, embed, view)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        return self.messages[message_id]
+
+    def get_partial_message(self, message_id: int) -> FakeMessage:
+        return self.messages.get(message_id) or FakeMessage(self)
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+        self.bot = False
+        self.roles: List[FakeRole] = []
+        self.direct_messages: List[FakeMessage] = []
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content: str = None, *, embed: discord.Embed = None, **kwargs) -> FakeMessage:
+        message = FakeMessage(None, content, embed)
+        self.direct_messages.append(message)
+        return message
+
+    async def add_roles(self, *roles: FakeRole, **kwargs):
+        self.roles += [role for role in roles if role not in self.roles]
+
+    async def remove_roles(self, *roles: FakeRole, **kwargs):
+        self.roles = [role for role in self.roles if role not in roles]
+
+
+class FakeBot:
+    def __init__(self):
+        self.user = FakeUser(next(snowflakes), "Ready Check Bot")
+        self.user.bot = True
+        self.users: Dict[int, FakeUser] = {}
+        self.channels: Dict[int, FakeChannel] = {}
+        self.cogs: Dict[str, object] = {}
+
+    def add_user(self, user: FakeUser):
+        self.users[user.id] = user
+
+    def get_user(self, user_id: int) -> FakeUser | None:
+        return self.users.get(user_id)
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        return self.users[user_id]
+
+    def get_channel(self, channel_id: int) -> FakeChannel:
+        if channel_id not in self.channels:
+            self.channels[channel_id] = FakeChannel(channel_id)
+        return self.channels[channel_id]
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_cog(self, name: str):
+        return self.cogs.get(name)
+
+
+class FakeGuild:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+    def get_member(self, user_id: int) -> FakeUser | None:
+        return self.bot.get_user(user_id)
+
+    def get_role(self, role_id: int) -> FakeRole:
+        return FakeRole(role_id)
+
+    def get_channel(self, channel_id: int) -> FakeChannel:
+        return self.bot.get_channel(channel_id)
+
+
+class FakeResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+        self.done = False
+        self.modal: discord.ui.Modal | None = None
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def send_message(self, content: str = None, *, embed: discord.Embed = None, view: discord.ui.View = None,
+                           **kwargs):
+        self.done = True
+        await self.interaction.add_message(FakeMessage(None, content, embed, view))
+
+    async def send_modal(self, modal: discord.ui.Modal):
+        self.done = True
+        self.modal = modal
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+        if self.interaction.message:
+            await self.interaction.message.edit(**kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content: str = None, *, embed: discord.Embed = None, view: discord.ui.View = None,
+                   **kwargs) -> FakeMessage:
+        message = FakeMessage(None, content, embed, view)
+        await self.interaction.add_message(message)
+        return message
+
+
+class FakeInteraction:
+    def __init__(self, bot: FakeBot, user: FakeUser, guild: FakeGuild, message: FakeMessage = None):
+        self.id = next(snowflakes)
+        self.type = discord.InteractionType.component
+        self.client = bot
+        self.user = user
+        self.guild = guild
+        self.message = message
+        self.data = {}
+        self.created_at = discord.utils.utcnow()
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        # Ephemeral responses and followups
+        self.messages: List[FakeMessage] = []
+        self.message_sent = asyncio.Condition()
+
+    async def add_message(self, message: FakeMessage):
+        async with self.message_sent:
+            self.messages.append(message)
+            self.message_sent.notify_all()
+
+    async def edit_original_response(self, **kwargs) -> FakeMessage:
+        if not self.messages:
+            await self.add_message(FakeMessage(None))
+        return await self.messages[0].edit(**kwargs)
+
+    async def wait_for_messages(self, count: int, timeout: float) -> List[FakeMessage]:
+        async with self.message_sent:
+            await asyncio.wait_for(self.message_sent.wait_for(lambda: len(self.messages) >= count), timeout)
+        return self.messages
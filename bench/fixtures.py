@@ -0,0 +1,372 @@
+import json
+import random
+import sys
+from typing import Dict, List
+
+# Deterministic stand-ins for the GW2 API, dps.report and Snow Crows responses used by the benchmarks.
+# They have the structure of the real responses (the fields the bot reads plus the usual filler around them),
+# the values themselves are made up. Real recordings can be used instead, see load_fixtures.
+
+ACCOUNT_NAME = "Bench.1234"
+API_KEY = "BENCH-0000-0000-0000-0000"
+BUILD_PATH = "builds/raids/guardian/power-firebrand"
+BUILD_LIST_PATH = "builds/Guardian"
+# Achievements of the raid bosses (see Boss.init)
+BOSS_ACHIEVEMENTS = [2654, 2667, 2659, 2826, 2836, 3014, 3017, 3349, 3321, 3347, 3364, 4004, 4038, 3998, 4036, 4016,
+                     4423, 4364, 4396, 4796, 4801, 4799, 5118, 6243, 6513, 6433, 6411, 6431, 6115]
+
+# key -> (eiEncounterID, fight name, duration in seconds, mechanic names)
+ENCOUNTERS = {
+    "vg": (131329, "Vale Guardian", 180, ["Split", "Boss TP", "Green", "Seeker"]),
+    "gorseval": (131330, "Gorseval", 240, ["Egg", "Slam", "Orb", "Black"]),
+    "cairn": (132097, "Cairn", 150, ["KB", "Port", "Orb Push", "Agony"]),
+    "deimos": (132100, "Deimos", 420, ["Oil T.", "Pizza", "Mind Crush", "Teleports", "Tear"]),
+}
+
+PROFESSIONS = ["Firebrand", "Chronomancer", "Druid", "Scourge", "Weaver", "Renegade", "Berserker", "Holosmith",
+               "Deadeye", "Specter"]
+
+# itemstats id -> (name, attributes as (attribute, multiplier, value))
+ITEMSTATS = {
+    160: ("Assassin's", [("Precision", 0.35, 0), ("Power", 0.25, 0), ("CritDamage", 0.25, 0)]),
+    161: ("Berserker's", [("Power", 0.35, 0), ("Precision", 0.25, 0), ("CritDamage", 0.25, 0)]),
+    1123: ("Harrier's", [("Power", 0.35, 0), ("Healing", 0.25, 0), ("BoonDuration", 0.25, 0)]),
+    1128: ("Diviner's", [("Power", 0.35, 0), ("BoonDuration", 0.25, 0), ("Precision", 0.25, 0), ("CritDamage", 0.25, 0)]),
+}
+STAT_CHOICES = sorted(ITEMSTATS)
+
+# slot -> (item id, item type, details type, attribute adjustment, SC label)
+GEAR = {
+    "Helm": (48073, "Armor", "Helm", 179.28, "Helm"),
+    "Shoulders": (48074, "Armor", "Shoulders", 134.46, "Shoulders"),
+    "Coat": (48075, "Armor", "Coat", 403.38, "Coat"),
+    "Gloves": (48076, "Armor", "Gloves", 134.46, "Gloves"),
+    "Leggings": (48077, "Armor", "Leggings", 268.92, "Leggings"),
+    "Boots": (48078, "Armor", "Boots", 134.46, "Boots"),
+    "Backpack": (74155, "Back", None, 215.13, "Backpiece"),
+    "Accessory1": (81908, "Trinket", "Accessory", 398.61, "Accessory"),
+    "Accessory2": (81909, "Trinket", "Accessory", 398.61, "Accessory"),
+    "Amulet": (79980, "Trinket", "Amulet", 1012.53, "Amulet"),
+    "Ring1": (80002, "Trinket", "Ring", 577.16, "Ring"),
+    "Ring2": (80003, "Trinket", "Ring", 577.16, "Ring"),
+    "WeaponA1": (46774, "Weapon", "Sword", 1045.51, "Main Hand"),
+    "WeaponA2": (46773, "Weapon", "Focus", 905.2, "Off Hand"),
+    "WeaponB1": (46762, "Weapon", "Greatsword", 1905.84, "Main Hand"),
+}
+RUNE = 24836
+SIGILS = [24615, 24618, 24868]
+INFUSION = 49432
+FOOD = 91805
+UTILITY = 9443
+RELIC = 100916
+
+UPGRADES = {
+    RUNE: ("Superior Rune of the Scholar", "Rune", [("Power", 25), ("Ferocity", 25)]),
+    SIGILS[0]: ("Superior Sigil of Force", "Sigil", None),
+    SIGILS[1]: ("Superior Sigil of Accuracy", "Sigil", None),
+    SIGILS[2]: ("Superior Sigil of Impact", "Sigil", None),
+    INFUSION: ("Mighty +9 Agony Infusion", "Infusion", [("Power", 5), ("AgonyResistance", 9)]),
+}
+
+
+def filler_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(["armor", "might", "fury", "quickness", "alacrity", "boon", "strike", "condition",
+                                "the", "of", "and", "a", "to", "raid", "squad", "boss"]) for _ in range(words))
+
+
+def get_item(item_id: int, name: str, item_type: str, rarity: str, details: dict) -> dict:
+    rng = random.Random(item_id)
+    return {
+        "name": name,
+        "description": filler_text(rng, 20),
+        "type": item_type,
+        "level": 80,
+        "rarity": rarity,
+        "vendor_value": rng.randrange(1000),
+        "default_skin": rng.randrange(10000),
+        "game_types": ["Activity", "Wvw", "Dungeon", "Pve"],
+        "flags": ["HideSuffix", "AccountBound", "NoSalvage", "NoSell", "AccountBindOnUse"],
+        "restrictions": [],
+        "id": item_id,
+        "chat_link": f"[&AgH{item_id:06d}AAA=]",
+        "icon": f"https://render.guildwars2.com/file/{rng.getrandbits(128):032X}/{item_id}.png",
+        "details": details,
+    }
+
+
+def get_items() -> Dict[int, dict]:
+    items = {}
+    for slot, (item_id, item_type, details_type, adjustment, _) in GEAR.items():
+        details = {"infusion_slots": [{"flags": ["Infusion"]}], "attribute_adjustment": adjustment,
+                   "stat_choices": STAT_CHOICES, "secondary_suffix_item_id": ""}
+        if details_type:
+            details["type"] = details_type
+        if item_type == "Armor":
+            details |= {"weight_class": "Heavy", "defense": 121}
+        if item_type == "Weapon":
+            details |= {"damage_type": "Physical", "min_power": 1045, "max_power": 1155, "defense": 0}
+        items[item_id] = get_item(item_id, f"Bench {slot}", item_type, "Ascended", details)
+
+    for item_id, (name, details_type, attributes) in UPGRADES.items():
+        details = {"type": details_type, "flags": ["HeavyArmor", "Trinket"], "infusion_upgrade_flags": [],
+                   "suffix": name.split(" of ")[-1]}
+        if attributes:
+            details["infix_upgrade"] = {"id": 0, "attributes": [{"attribute": attribute, "modifier": modifier}
+                                                                 for attribute, modifier in attributes]}
+        items[item_id] = get_item(item_id, name, "UpgradeComponent", "Exotic" if details_type != "Infusion" else "Ascended", details)
+
+    items[FOOD] = get_item(FOOD, "Bowl of Fruit Salad with Mint Garnish", "Consumable", "Fine",
+                           {"type": "Food", "duration_ms": 1800000, "description": "Nourishment"})
+    items[UTILITY] = get_item(UTILITY, "Superior Sharpening Stone", "Consumable", "Fine",
+                              {"type": "Utility", "duration_ms": 1800000, "description": "Enhancement"})
+    items[RELIC] = get_item(RELIC, "Relic of the Thief", "Relic", "Exotic", {})
+    return items
+
+
+def get_itemstats() -> Dict[int, dict]:
+    return {stats_id: {"id": stats_id, "name": name,
+                       "attributes": [{"attribute": attribute, "multiplier": multiplier, "value": value}
+                                      for attribute, multiplier, value in attributes]}
+            for stats_id, (name, attributes) in ITEMSTATS.items()}
+
+
+def get_upgrades(slot: str) -> List[int]:
+    if slot in ("Helm", "Shoulders", "Coat", "Gloves", "Leggings", "Boots"):
+        return [RUNE]
+    if slot == "WeaponB1":
+        return SIGILS[:2]
+    if slot.startswith("Weapon"):
+        return [SIGILS[2]]
+    return []
+
+
+def get_character(name: str) -> dict:
+    rng = random.Random(name)
+    stats = get_itemstats()
+    tab_equipment = []
+    equipment = []
+    for slot, (item_id, item_type, *_) in GEAR.items():
+        stats_id = 161 if slot not in ("Ring1", "Accessory2") else 160
+        item_stats = {"id": stats_id, "attributes": {attribute["attribute"]: round(attribute["multiplier"] * 100)
+                                                     for attribute in stats[stats_id]["attributes"]}}
+        infusions = [INFUSION] if item_type in ("Armor", "Back", "Trinket") else []
+        tab_item = {"id": item_id, "slot": slot, "upgrades": get_upgrades(slot), "binding": "Account",
+                    "dyes": [rng.randrange(1, 1500) for _ in range(4)] if item_type == "Armor" else None}
+        character_item = {"id": item_id, "slot": slot, "location": "Equipped", "tabs": [1, 2], "binding": "Account",
+                          "stats": item_stats, "infusions": infusions, "upgrades": get_upgrades(slot)}
+        # Like the real API, weapons only have their stats and infusions in the character equipment
+        if item_type != "Weapon":
+            tab_item["stats"] = item_stats
+            tab_item["infusions"] = infusions
+        tab_equipment.append(tab_item)
+        equipment.append(character_item)
+    # Slots the bot ignores
+    tab_equipment.append({"id": 79895, "slot": "HelmAquatic", "upgrades": [RUNE], "binding": "Account"})
+    tab_equipment.append({"id": 30699, "slot": "WeaponAquaticA", "upgrades": [SIGILS[0]], "binding": "Account"})
+
+    return {
+        "name": name,
+        "race": "Human",
+        "gender": "Female",
+        "profession": "Guardian",
+        "level": 80,
+        "age": rng.randrange(10 ** 7),
+        "created": "2019-04-12T17:28:00Z",
+        "deaths": rng.randrange(10000),
+        "crafting": [{"discipline": "Weaponsmith", "rating": 500, "active": True}],
+        "equipment": equipment,
+        "equipment_tabs": [
+            {"tab": 1, "name": "Raid", "is_active": True, "equipment": tab_equipment, "equipment_pvp": {}},
+            {"tab": 2, "name": "Open World", "is_active": False, "equipment": tab_equipment[:6], "equipment_pvp": {}},
+        ],
+        "bags": [{"id": 85371, "size": 20, "inventory": [
+            {"id": rng.randrange(10000, 100000), "count": rng.randrange(1, 250), "binding": "Account"} if rng.random() < 0.8 else None
+            for _ in range(20)]} for _ in range(8)],
+        "recipes": [rng.randrange(1000, 15000) for _ in range(300)],
+        "skills": {mode: {"heal": 9153, "utilities": [9246, 43357, 9093], "elite": 43123} for mode in ("pve", "pvp", "wvw")},
+        "training": [{"id": i, "spent": rng.randrange(100), "done": rng.random() < 0.5} for i in range(40)],
+        "wvw_abilities": [{"id": i, "rank": rng.randrange(1, 6)} for i in range(20)],
+    }
+
+
+def get_achievements() -> List[dict]:
+    # Accounts have progress on thousands of achievements, only the raid bosses matter
+    rng = random.Random(ACCOUNT_NAME)
+    achievements = [{"id": achievement_id, "current": 1, "max": 1, "done": True} for achievement_id in BOSS_ACHIEVEMENTS]
+    achievements += [{"id": achievement_id, "bits": [rng.randrange(20) for _ in range(rng.randrange(5))],
+                      "current": rng.randrange(10), "max": 10, "done": rng.random() < 0.5}
+                     for achievement_id in range(7000, 10000)]
+    return sorted(achievements, key=lambda achievement: achievement["id"])
+
+
+def get_gw2_fixtures() -> dict:
+    return {
+        "items": get_items(),
+        "itemstats": get_itemstats(),
+        "character": get_character("Bench Character"),
+        "tokeninfo": {"id": API_KEY, "name": "Bench", "permissions": [
+            "account", "builds", "characters", "guilds", "inventories", "progression", "tradingpost", "unlocks", "wallet"]},
+        "account": {"id": "A2D4E6F8-0000-0000-0000-000000000000", "name": ACCOUNT_NAME, "age": 12345678, "world": 2012,
+                    "guilds": [], "guild_leader": [], "created": "2015-08-28T00:00:00Z",
+                    "access": ["GuildWars2", "HeartOfThorns", "PathOfFire", "EndOfDragons"], "commander": True,
+                    "fractal_level": 100, "daily_ap": 15000, "monthly_ap": 1200, "wvw_rank": 500},
+        "account/masteries": [{"id": mastery_id, "level": level} for mastery_id, level in
+                              [(1, 5), (2, 6), (4, 3), (6, 6), (8, 5), (11, 3), (18, 2), (23, 5), (24, 4)]],
+        "account/achievements": get_achievements(),
+    }
+
+
+def get_build_page() -> str:
+    # Same markup as the parts of a Snow Crows build page that parse_build_page reads
+    rng = random.Random(BUILD_PATH)
+    rows = []
+
+    def add_row(item_id, stats_id, upgrades, label):
+        attributes = f'data-armory-ids="{item_id}"'
+        if stats_id:
+            attributes += f' data-armory-{item_id}-stat="{stats_id}"'
+        if upgrades:
+            attributes += f' data-armory-{item_id}-upgrades="{",".join(str(u) for u in upgrades)}"'
+        label = f"<span>{label}</span>" if label else ""
+        rows.append(f'<tr><td><div class="armory-embed" data-armory-embed="items" {attributes}></div></td>'
+                    f'<td><p class="text-sm">{label}</p></td></tr>')
+
+    for slot, (item_id, item_type, _, _, label) in GEAR.items():
+        add_row(item_id, 161 if slot != "Ring2" else 160, get_upgrades(slot), label)
+    # Empty off hand of the second weapon set
+    add_row("", None, None, "Off Hand")
+    add_row(INFUSION, None, None, "18x")
+    add_row(RELIC, None, None, "Relic")
+    add_row(FOOD, None, None, "Food")
+    add_row(UTILITY, None, None, "Utility")
+
+    paragraphs = "".join(f"<p>{filler_text(rng, 60)}</p>" for _ in range(120))
+    script = "var armory = " + json.dumps({"skills": [rng.randrange(100000) for _ in range(2000)]}) + ";"
+    return (f"<!DOCTYPE html><html><head><title>Power Firebrand - Snow Crows</title><script>{script}</script></head>"
+            f"<body><nav>{''.join(f'<a href=/builds/raids/{p.lower()}>{p}</a>' for p in PROFESSIONS)}</nav>"
+            f"<h1>Power Firebrand</h1><div class=\"flex\"><span><i class=\"fa-solid fa-shuffle mr-2\"></i>Guardian Firebrand</span></div>"
+            f"<section>{paragraphs}</section><table><tbody>{''.join(rows)}</tbody></table>"
+            f"<section>{paragraphs}</section></body></html>")
+
+
+def get_build_list_page() -> str:
+    # Featured builds of the profession, kite builds are skipped by the bot
+    links = [(BUILD_PATH, "Featured"), ("builds/raids/guardian/quickness-firebrand-kite", "Featured"),
+             ("builds/raids/guardian/condition-firebrand", "Beginner")]
+    cards = "".join(f'<a href="/{path}"><div class="text-lg">{path.rsplit("/", 1)[-1]}</div>'
+                    f'<div class="text-xs">{category}</div></a>' for path, category in links)
+    return (f"<!DOCTYPE html><html><head><title>Guardian - Snow Crows</title></head>"
+            f"<body><nav>{''.join(f'<a href=/builds/raids/{p.lower()}>{p}</a>' for p in PROFESSIONS)}</nav>"
+            f"<h1>Guardian</h1><section>{cards}</section></body></html>")
+
+
+def get_player(rng: random.Random, index: int, duration: int, scale: int) -> dict:
+    account = ACCOUNT_NAME if index == 0 else f"Bench.{2000 + index}"
+    # Leave out Blood Magic and Emboldened, the log would be denied right away
+    buffs = [1187, 30328, 717, 740, 725, 1122, 873, 26980, 46587, 46668] + \
+            [buff_id for buff_id in (rng.randrange(10000, 70000) for _ in range(30)) if buff_id not in (29726, 68087)]
+    return {
+        "account": account,
+        "name": f"Bench Character {index}",
+        "profession": PROFESSIONS[index],
+        "group": index // 5 + 1,
+        "hasCommanderTag": index == 0,
+        "toughness": 0,
+        "concentration": 0,
+        "healing": 10 if index in (2, 7) else 0,
+        "condition": 0,
+        "weapons": ["Sword", "Focus", "Greatsword", "Unknown"],
+        "defenses": [{"damageTaken": rng.randrange(10 ** 6), "blockedCount": rng.randrange(50),
+                      "evadedCount": rng.randrange(50), "dodgeCount": rng.randrange(30),
+                      "downCount": 0 if index == 0 else rng.randrange(2), "deadCount": 0}],
+        "consumables": [{"stack": 1, "duration": 1800000, "time": 0, "id": FOOD},
+                        {"stack": 1, "duration": 1800000, "time": 0, "id": UTILITY},
+                        {"stack": 1, "duration": 0, "time": 0, "id": 9283}],
+        "buffUptimes": [{"id": buff_id, "buffData": [{"uptime": round(rng.uniform(0, 100), 3), "presence": 0,
+                                                      "generated": {}, "overstacked": {}, "wasted": {}}],
+                         "states": [[t * 1000, rng.randrange(25)] for t in range(0, duration, 5)]}
+                        for buff_id in buffs],
+        "dpsTargets": [[{"dps": rng.randrange(40000), "damage": rng.randrange(10 ** 7), "condiDps": 0,
+                         "condiDamage": 0, "powerDps": 0, "powerDamage": 0}]],
+        "damage1S": [[second * rng.randrange(30000) for second in range(duration + 1)]],
+        "rotation": [{"id": rng.randrange(9000, 70000), "skills": [
+            {"castTime": rng.randrange(duration * 1000), "duration": rng.randrange(1000), "timeGained": 0, "quickness": 0.0}
+            for _ in range(duration * scale // 5)]} for _ in range(10)],
+        "combatReplayData": {"start": 0, "positions": [[round(rng.uniform(0, 1000), 2), round(rng.uniform(0, 1000), 2)]
+                                                       for _ in range(duration * scale * 1000 // 150)]},
+    }
+
+
+def get_log_json(key: str, scale: int = 1) -> dict:
+    encounter_id, fight_name, duration, mechanic_names = ENCOUNTERS[key]
+    rng = random.Random(encounter_id)
+    players = [get_player(rng, index, duration, scale) for index in range(10)]
+    mechanics = []
+    for name in mechanic_names + ["Downed", "Got up", "Res"]:
+        # Most mechanics are never failed by the submitting player
+        actors = [player["name"] for player in players[1:]] + ([players[0]["name"]] if name == "Res" else [])
+        mechanics.append({"name": name, "fullName": f"{name} ({fight_name})", "description": filler_text(rng, 8),
+                          "isAchievementEligibility": False,
+                          "mechanicsData": [{"time": rng.randrange(duration * 1000), "actor": rng.choice(actors)}
+                                            for _ in range(rng.randrange(1, duration // 4))]})
+    return {
+        "eliteInsightsVersion": "2.60.0.0",
+        "triggerID": encounter_id,
+        "eiEncounterID": encounter_id,
+        "fightName": fight_name,
+        "fightIcon": f"https://wiki.guildwars2.com/images/{encounter_id}.png",
+        "arcVersion": "EVTC20230716",
+        "gW2Build": 150000,
+        "language": "English",
+        "recordedBy": players[0]["name"],
+        "timeStart": "2023-08-01 20:00:00 +02:00",
+        "timeEnd": "2023-08-01 20:07:00 +02:00",
+        "duration": f"{duration // 60:02d}m {duration % 60:02d}s 000ms",
+        "durationMS": duration * 1000,
+        "success": True,
+        "isCM": False,
+        "targets": [{"id": encounter_id, "name": fight_name, "totalHealth": 22021440, "finalHealth": 0,
+                     "healthPercents": [[t * 1000, 100 - t * 100 / duration] for t in range(duration * scale)],
+                     "damage1S": [[second * rng.randrange(300000) for second in range(duration + 1)]]}],
+        "players": players,
+        "phases": [{"start": 0, "end": duration * 1000, "name": "Full Fight", "targets": [0], "breakbarPhase": False}],
+        "mechanics": mechanics,
+        "skillMap": {f"s{rng.randrange(9000, 70000)}": {"name": filler_text(rng, 3), "autoAttack": False,
+                                                        "icon": "https://render.guildwars2.com/file/skill.png"}
+                     for _ in range(400)},
+        "buffMap": {f"b{rng.randrange(700, 70000)}": {"name": filler_text(rng, 3), "stacking": True,
+                                                      "icon": "https://render.guildwars2.com/file/buff.png"}
+                    for _ in range(300)},
+    }
+
+
+def get_log_url(key: str, number: int = None) -> str:
+    # The stand-in returns the encounter for any permalink ending in _<encounter>, like real dps.report permalinks
+    if number is None:
+        return f"https://dps.report/bench-{key}"
+    return f"https://dps.report/{number:04x}-20230801-200000_{key}"
+
+
+def get_fixtures(log_scale: int = 1) -> dict:
+    return {
+        "gw2": get_gw2_fixtures(),
+        "dps_report": {f"bench-{key}": get_log_json(key, log_scale) for key in ENCOUNTERS},
+        "snowcrows": {BUILD_PATH: get_build_page(), BUILD_LIST_PATH: get_build_list_page()},
+    }
+
+
+def load_fixtures(path: str = None, log_scale: int = 1) -> dict:
+    # Recorded responses can be dropped into a json file with the same structure as get_fixtures
+    if not path:
+        return get_fixtures(log_scale)
+    with open(path) as file:
+        fixtures = json.load(file)
+    for endpoint in ("items", "itemstats"):
+        fixtures["gw2"][endpoint] = {int(i): entry for i, entry in fixtures["gw2"][endpoint].items()}
+    return fixtures
+
+
+# Writes the fixtures to a file, e.g. as a starting point for recorded responses
+if __name__ == "__main__":
+    with open(sys.argv[1] if len(sys.argv) > 1 else "fixtures.json", "w") as output:
+        json.dump(get_fixtures(), output)
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+# Measures the gear check and log check hot paths against the local stand-in server (see stand_in.py).
+# Usage: python bench/hot_paths.py [--repeat 20] [--latency 50] [--fixtures recorded.json] [--output results.json]
+# Prints one json document: latency, round trips to the stand-in per service, traced allocations and RSS growth.
+# Allocations of the process pool workers are not traced, run with PROCESS_POOL_WORKERS=0 to include them.
+from common import get_memory_status, get_path, get_peak_rss_kb, get_stand_in_port, prepare_environment, reset_peak_rss, summarize
+
+STAND_IN_URL = prepare_environment()
+
+from sqlalchemy import delete
+from database import engine, init_db, Session
+import models.stats, models.build, models.application, models.equipment, models.item
+from api import API
+from fixtures import ACCOUNT_NAME, API_KEY, BUILD_PATH, ENCOUNTERS, get_log_url
+from helpers.dps_report import download_log_json
+from helpers.log_checks import check_log
+from helpers.log_evaluation import check_mechanics
+from helpers.log_summary import LogSummary
+from helpers.process_pool import PROCESS_POOL_WORKERS, shutdown_pool
+from helpers.rules import RuleIndex
+from migrations import migrate_db
+from models.boss import Boss
+from models.catalog import CatalogItem, CatalogItemStats
+from models.config import Config
+from models.enums.role import Role
+from models.feedback import FeedbackGroup
+from models.log import Log
+from models.mech import Mech
+from snowcrows import get_sc_build
+from stand_in import StandInProcess
+
+
+async def measure(stand_in: StandInProcess, func: Callable[[int], Awaitable], repeat: int) -> dict:
+    # The first run is reported separately, it fills the item catalogue and starts the worker processes
+    latencies = []
+    round_trips = []
+    services = {}
+    cold = None
+    rss_before = None
+    for i in range(repeat + 1):
+        before = await stand_in.requests()
+        start = time.perf_counter()
+        await func(i)
+        latency = (time.perf_counter() - start) * 1000
+        after = await stand_in.requests()
+        delta = {service: after[service] - before.get(service, 0) for service in after if after[service] != before.get(service, 0)}
+        if i == 0:
+            cold = {"latency_ms": round(latency, 3), "round_trips": sum(delta.values()), "round_trips_by_service": delta}
+            # The peak RSS of the warm runs is measured from here
+            rss_before = reset_peak_rss()
+            continue
+        latencies.append(latency)
+        round_trips.append(sum(delta.values()))
+        for service, count in delta.items():
+            services[service] = services.get(service, 0) + count
+
+    rss_peak = get_memory_status("VmHWM")
+
+    # One more run to trace the allocations, tracing slows everything down
+    tracemalloc.start()
+    await func(repeat + 1)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "runs": repeat,
+        "latency_ms": summarize(latencies),
+        "round_trips": statistics.mean(round_trips),
+        "round_trips_by_service": {service: count / repeat for service, count in services.items()},
+        "cold": cold,
+        "allocated_peak_kb": round(peak / 1024, 1),
+        "allocated_retained_kb": round(current / 1024, 1),
+        # How far the warm runs raised the RSS above where they started, None where the peak RSS can't be reset
+        "rss_growth_kb": rss_peak - rss_before if rss_before is not None and rss_peak is not None else None,
+    }
+
+
+async def clear_catalog():
+    async with Session.begin() as session:
+        await session.execute(delete(CatalogItem))
+        await session.execute(delete(CatalogItemStats))
+
+
+async def setup_db():
+    await init_db()
+    await migrate_db()
+    async with Session() as session:
+        # Boss.init commits by itself
+        await Boss.init(session)
+    async with Session.begin() as session:
+        Mech.init(session)
+        await Config.init(session, False)
+    async with Session() as session:
+        await Config.load(session)
+    await RuleIndex.reload()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    await setup_db()
+    stand_in_args = ["--latency", str(args.latency), "--log-scale", str(args.log_scale)]
+    if args.fixtures:
+        stand_in_args += ["--fixtures", get_path(args.fixtures)]
+    stand_in = StandInProcess(get_stand_in_port(), stand_in_args)
+    await stand_in.start()
+    api = API(API_KEY)
+    results = {}
+    try:
+        # Gear check: a new character name every run so the http cache of the characters endpoint doesn't hit
+        await clear_catalog()
+        equipment = None
+
+        async def get_equipment(i: int):
+            nonlocal equipment
+            equipment = await api.get_equipment(f"Bench Character {i}")
+        results["api.get_equipment"] = await measure(stand_in, get_equipment, args.repeat)
+
+        await clear_catalog()
+        build = None
+
+        async def get_build(i: int):
+            nonlocal build
+            build = await get_sc_build(f"{STAND_IN_URL}/{BUILD_PATH}", api)
+        results["get_sc_build"] = await measure(stand_in, get_build, args.repeat)
+
+        async def compare(i: int):
+            equipment.compare(build.equipment)
+        results["equipment.compare"] = await measure(stand_in, compare, args.repeat)
+
+        # Log checks, every encounter on its own since the cost grows with the size of the log
+        for key, (encounter_id, *_) in ENCOUNTERS.items():
+            log_url = get_log_url(key)
+            log_json = None
+
+            async def download(i: int):
+                nonlocal log_json
+                log_json = await download_log_json(log_url)
+            results[f"download_log_json[{key}]"] = await measure(stand_in, download, args.repeat)
+
+            async def check(i: int):
+                log = Log()
+                log.discord_user_id = i
+                log.tier = 2
+                log.role = Role.POWER_DPS
+                log.encounter_id = log_json["eiEncounterID"]
+                log.is_cm = log_json["isCM"]
+                await check_log(log_json, ACCOUNT_NAME, 2, i, log_url, log)
+            results[f"check_log[{key}]"] = await measure(stand_in, check, args.repeat)
+
+            rules = RuleIndex.current.get(encounter_id, False)
+
+            async def mechanics(i: int):
+                check_mechanics(LogSummary(log_json), ACCOUNT_NAME, rules, FeedbackGroup("Checking mechanics"))
+            results[f"check_mechanics[{key}]"] = await measure(stand_in, mechanics, args.repeat)
+    finally:
+        await stand_in.stop()
+        await API.close_session()
+        await engine.dispose()
+        shutdown_pool()
+
+    return {
+        "config": {
+            "repeat": args.repeat,
+            "latency_ms": args.latency,
+            "log_scale": args.log_scale,
+            "fixtures": args.fixtures or "synthetic",
+            "process_pool_workers": PROCESS_POOL_WORKERS,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+        "peak_rss_kb": get_peak_rss_kb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds the stand-in adds to every response")
+    parser.add_argument("--fixtures", help="Json file with recorded responses, see fixtures.py")
+    parser.add_argument("--log-scale", type=int, default=1, help="Makes the generated logs larger")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    args = parser.parse_args()
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(os.environ["BENCH_TMP_DIR"], ignore_errors=True)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(get_path(args.output), "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+# Worker processes import this module as well
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import time
+import traceback
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+# Runs the application and log flows of many simulated users at the same time against the stand-in server (see stand_in.py).
+# The handlers of the buttons, selects and modals are called directly with fake interactions (see fake_discord.py).
+# Usage: python bench/load_test.py [--users 200] [--flows application,log] [--ramp-up 10] [--latency 50] [--jitter 20]
+#        [--error-rate 0.01] [--rate-limit-rate 0.05] [--cloudflare-rate 0.1] [--output results.json]
+# Prints one json document: outcomes and latency per flow and step, requests and injected faults per service,
+# shared GW2 API requests, log queue wait and check times and peak RSS.
+# BENCH_DATABASE_URL runs the flows against another database, e.g. a scratch PostgreSQL. Never use the production database.
+from common import get_path, get_peak_rss_kb, get_stand_in_port, prepare_environment, summarize
+
+STAND_IN_URL = prepare_environment()
+
+import discord
+from sqlalchemy import delete
+from database import engine, init_db, Session
+import models.stats, models.build, models.application, models.equipment, models.item
+from api import API
+from cogs.admin_commands import AdminCommands
+from cogs.log_queue import LogQueue
+from fake_discord import FakeBot, FakeGuild, FakeInteraction, FakeMessage, FakeUser, snowflakes
+from fixtures import API_KEY, ENCOUNTERS, get_log_url
+from helpers.dps_report import download_stats
+from helpers.process_pool import PROCESS_POOL_WORKERS, shutdown_pool
+from helpers.rules import RuleIndex
+from migrations import migrate_db
+from models.boss import Boss
+from models.config import Config
+from models.enums.role import Role
+from models.mech import Mech
+from stand_in import StandInProcess, get_character_name
+from views.application import AUTOMATIC_BUILD, ApplicationView, SimpleButtonView
+from views.application_overview import ApplicationOverview
+from views.submit_log import SubmitLogModal
+
+FLOWS = ("application", "log", "builds")
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, bot: FakeBot, guild: FakeGuild):
+        self.args = args
+        self.bot = bot
+        self.guild = guild
+        self.admin = FakeUser(next(snowflakes), "Bench Admin")
+        self.bot.add_user(self.admin)
+        self.outcomes: Dict[str, Counter] = defaultdict(Counter)
+        self.errors = Counter()
+        # Milliseconds per flow and per step of a flow
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.steps: Dict[str, List[float]] = defaultdict(list)
+        self.users: Dict[int, FakeUser] = {}
+
+    def add_user(self, number: int) -> FakeUser:
+        user = FakeUser(next(snowflakes), f"Bench User {number}")
+        self.bot.add_user(user)
+        self.users[number] = user
+        return user
+
+    def interaction(self, user: FakeUser, message: FakeMessage = None) -> FakeInteraction:
+        return FakeInteraction(self.bot, user, self.guild, message)
+
+    def add_error(self, error: Exception):
+        self.errors[type(error).__name__] += 1
+        if self.args.verbose:
+            traceback.print_exception(error)
+
+    async def dispatch_item(self, step: str, view: discord.ui.View, item: discord.ui.Item, interaction: FakeInteraction) -> bool:
+        # Same as discord.py does for a component interaction, returns False if the handler raised
+        start = time.perf_counter()
+        try:
+            if await view.interaction_check(interaction):
+                await item.callback(interaction)
+            return True
+        except Exception as error:
+            self.add_error(error)
+            try:
+                await view.on_error(interaction, error, item)
+            except Exception as on_error:
+                self.add_error(on_error)
+            return False
+        finally:
+            self.steps[step].append((time.perf_counter() - start) * 1000)
+
+    async def dispatch_modal(self, step: str, modal: discord.ui.Modal, interaction: FakeInteraction) -> bool:
+        start = time.perf_counter()
+        try:
+            if await modal.interaction_check(interaction):
+                await modal.on_submit(interaction)
+            return True
+        except Exception as error:
+            self.add_error(error)
+            try:
+                await modal.on_error(interaction, error)
+            except Exception as on_error:
+                self.add_error(on_error)
+            return False
+        finally:
+            self.steps[step].append((time.perf_counter() - start) * 1000)
+
+    async def run_application(self, number: int) -> str:
+        user = self.add_user(number)
+        api_key = f"{API_KEY}-{number}"
+
+        # Click "Regular [Gearcheck]"
+        overview = ApplicationOverview(self.bot)
+        interaction = self.interaction(user)
+        if not await self.dispatch_item("application: open", overview, overview.apply_t1, interaction):
+            return "error"
+        modal = interaction.response.modal
+        if not modal:
+            return "rejected"
+
+        # Fill in the modal
+        interaction = self.interaction(user)
+        modal.api_key._refresh_state(interaction, {"value": api_key})
+        modal.character._refresh_state(interaction, {"value": get_character_name(api_key)})
+        if not await self.dispatch_modal("application: check account", modal, interaction):
+            return "error"
+        view = interaction.messages[-1].view if interaction.messages else None
+        if not isinstance(view, ApplicationView):
+            return "rejected"
+
+        # Pick the first equipment template and the best matching build
+        message = view.original_message
+        for select, value in ((view.equipment_tabs_select, "1"), (view.build_select, AUTOMATIC_BUILD)):
+            interaction = self.interaction(user, message)
+            select._refresh_state(interaction, {"values": [value]})
+            if not await self.dispatch_item("application: select", view, select, interaction):
+                return "error"
+
+        interaction = self.interaction(user, message)
+        if not await self.dispatch_item("application: check gear", view, view.submit, interaction):
+            return "error"
+
+        if isinstance(message.view, SimpleButtonView):
+            # Request the manual review
+            review_view = message.view
+            interaction = self.interaction(user, message)
+            if not await self.dispatch_item("application: request review", review_view, review_view.confirm, interaction):
+                return "error"
+            return "manual_review"
+        if message.embed and message.embed.colour == discord.Colour.green():
+            return "passed"
+        return "gear_errors"
+
+    async def run_log(self, number: int) -> str:
+        user = self.add_user(number)
+        api_key = f"{API_KEY}-{number}"
+        encounter = list(ENCOUNTERS)[number % len(ENCOUNTERS)]
+
+        # Click "View Progress"
+        overview = ApplicationOverview(self.bot)
+        interaction = self.interaction(user)
+        if not await self.dispatch_item("log: view progress", overview, overview.view_progress, interaction):
+            return "error"
+
+        # Submit a tier 2 log
+        modal = SubmitLogModal(self.bot, 2, Role.POWER_DPS)
+        interaction = self.interaction(user)
+        modal.api_key._refresh_state(interaction, {"value": api_key})
+        modal.log_url._refresh_state(interaction, {"value": get_log_url(encounter, number)})
+        if not await self.dispatch_modal("log: submit", modal, interaction):
+            return "error"
+        if not interaction.messages or not interaction.messages[-1].embed:
+            return "error"
+        fields = [field.name for field in interaction.messages[-1].embed.fields]
+        if any("already have a log in the queue" in name for name in fields):
+            return "duplicate"
+        if not any(name.startswith("Log queued") for name in fields):
+            return "rejected"
+
+        # The result is sent as a second followup once the queue checked the log
+        start = time.perf_counter()
+        try:
+            messages = await interaction.wait_for_messages(2, self.args.timeout)
+        except asyncio.TimeoutError:
+            return "timeout"
+        finally:
+            self.steps["log: wait for result"].append((time.perf_counter() - start) * 1000)
+        fields = [field.name for field in messages[1].embed.fields]
+        if any(name == "Log successfully submitted for manual review" for name in fields):
+            return "review"
+        if any("Error while parsing log" in name for name in fields):
+            return "download_failed"
+        if messages[1].embed.title == "Log Feedback":
+            return "denied"
+        return "error"
+
+    async def run_builds(self, number: int = 0) -> str:
+        # Imports all Snow Crows builds like /build init
+        cog = AdminCommands(self.bot)
+        interaction = self.interaction(self.admin)
+        start = time.perf_counter()
+        try:
+            await AdminCommands.build_init.callback(cog, interaction)
+        except Exception as error:
+            self.add_error(error)
+            return "error"
+        finally:
+            self.steps["builds: import"].append((time.perf_counter() - start) * 1000)
+        return "done"
+
+    async def run_user(self, flow: str, number: int, delay: float):
+        await asyncio.sleep(delay)
+        run: Callable[[int], Awaitable[str]] = getattr(self, f"run_{flow}")
+        start = time.perf_counter()
+        try:
+            outcome = await run(number)
+        except Exception as error:
+            self.add_error(error)
+            outcome = "error"
+        self.latencies[flow].append((time.perf_counter() - start) * 1000)
+        self.outcomes[flow][outcome] += 1
+
+
+async def setup_db():
+    await init_db()
+    await migrate_db()
+    # BENCH_DATABASE_URL may point at a database of an earlier run
+    async with Session.begin() as session:
+        await session.execute(delete(Mech))
+        await session.execute(delete(Boss))
+        await session.execute(delete(Config))
+    async with Session() as session:
+        # Boss.init commits by itself
+        await Boss.init(session)
+    async with Session.begin() as session:
+        Mech.init(session)
+        await Config.init(session, False)
+    async with Session() as session:
+        await Config.load(session)
+    await RuleIndex.reload()
+
+
+async def run(args: argparse.Namespace) -> dict:
+    await setup_db()
+    stand_in_args = ["--log-scale", str(args.log_scale)]
+    if args.fixtures:
+        stand_in_args += ["--fixtures", get_path(args.fixtures)]
+    stand_in = StandInProcess(get_stand_in_port(), stand_in_args)
+    await stand_in.start()
+    bot = FakeBot()
+    guild = FakeGuild(bot)
+    log_queue = LogQueue(bot)
+    bot.cogs["LogQueue"] = log_queue
+    await log_queue.cog_load()
+    test = LoadTest(args, bot, guild)
+    try:
+        await stand_in.check_faults()
+        # The applications need builds, they are imported before the faults are turned on
+        if await test.run_builds() != "done":
+            raise Exception("Could not import the builds from the stand-in")
+        test.steps.clear()
+        await stand_in.configure(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                 rate_limit_rate=args.rate_limit_rate, cloudflare_rate=args.cloudflare_rate)
+        before = await stand_in.stats()
+
+        # Every user starts at a random time within the ramp-up, all flows run at the same time
+        start = time.perf_counter()
+        tasks = []
+        for i, flow in enumerate(args.flows):
+            for number in range(args.users):
+                tasks.append(test.run_user(flow, i * args.users + number, random.uniform(0, args.ramp_up)))
+        await asyncio.gather(*tasks)
+        duration = time.perf_counter() - start
+        after = await stand_in.stats()
+    finally:
+        await log_queue.cog_unload()
+        await stand_in.stop()
+        await API.close_session()
+        await engine.dispose()
+        shutdown_pool()
+
+    return {
+        "config": {
+            "users": args.users,
+            "flows": args.flows,
+            "ramp_up_s": args.ramp_up,
+            "latency_ms": args.latency,
+            "jitter_ms": args.jitter,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+            "cloudflare_rate": args.cloudflare_rate,
+            "log_scale": args.log_scale,
+            "fixtures": args.fixtures or "synthetic",
+            "database": "BENCH_DATABASE_URL" if os.getenv("BENCH_DATABASE_URL") else "sqlite",
+            "process_pool_workers": PROCESS_POOL_WORKERS,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "duration_s": round(duration, 3),
+        "flows": {flow: {
+            "users": sum(test.outcomes[flow].values()),
+            "per_second": round(sum(test.outcomes[flow].values()) / duration, 2),
+            "outcomes": dict(test.outcomes[flow]),
+            "latency_ms": summarize(test.latencies[flow]),
+        } for flow in args.flows},
+        "steps_ms": {step: summarize(latencies) for step, latencies in test.steps.items()},
+        "errors": dict(test.errors),
+        "stand_in": {
+            kind: {key: count - before[kind].get(key, 0) for key, count in after[kind].items() if count != before[kind].get(key, 0)}
+            for kind in ("requests", "faults")
+        },
+        "api_coalescing": {endpoint: dict(counters) for endpoint, counters in API.coalescing_stats.items()},
+        "log_queue": {
+            "stats": dict(log_queue.stats),
+            # Only the last 100 submissions are kept
+            "wait_s": summarize(list(log_queue.wait_times)),
+            "check_s": summarize(list(log_queue.process_times)),
+        },
+        "log_downloads": dict(download_stats),
+        "peak_rss_kb": get_peak_rss_kb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200, help="Simulated users per flow")
+    parser.add_argument("--flows", default="application,log",
+                        help=f"Comma separated flows to run at the same time: {', '.join(FLOWS)}")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which the users start")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds a user waits for the result of a log")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds the stand-in adds to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many milliseconds are added on top")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of responses that are a 500, 502 or 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Share of responses that are a 429")
+    parser.add_argument("--cloudflare-rate", type=float, default=0,
+                        help="Share of dps.report and Snow Crows responses that are a Cloudflare challenge")
+    parser.add_argument("--fixtures", help="Json file with recorded responses, see fixtures.py")
+    parser.add_argument("--log-scale", type=int, default=1, help="Makes the generated logs larger")
+    parser.add_argument("--output", help="Write the results to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="Print the tracebacks of failed handlers")
+    args = parser.parse_args()
+    args.flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    for flow in args.flows:
+        if flow not in FLOWS:
+            parser.error(f"Unknown flow {flow}")
+    if not args.verbose:
+        # The handlers that fail because of injected faults are counted instead
+        logging.getLogger("discord").setLevel(logging.CRITICAL)
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(os.environ["BENCH_TMP_DIR"], ignore_errors=True)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(get_path(args.output), "w") as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+# Worker processes import this module as well
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+from typing import Awaitable, Callable
+
+# Counts the database round trips of the application, review and log flows and fails if a flow needs more than its budget.
+# The flows are the ones of load_test.py, run one at a time against the stand-in server (see stand_in.py).
+# Usage: python bench/query_counts.py
+# Exits with 1 if a flow got more expensive. Lower the budget below when a change saves queries.
+from common import get_stand_in_port, prepare_environment
+
+STAND_IN_URL = prepare_environment()
+
+from sqlalchemy import event, select
+from database import engine, Session
+from api import API
+from cogs.log_queue import LogQueue
+from cogs.review_interactions import ReviewInteractions
+from fake_discord import FakeBot, FakeGuild
+from helpers.process_pool import shutdown_pool
+from load_test import LoadTest, setup_db
+from models.application import Application
+from models.config import Config
+from models.enums.config_key import ConfigKey
+from models.log import Log
+from stand_in import StandInProcess
+
+# Queries per flow, counted on sqlite after a warm-up run that fills the item catalogue
+QUERY_BUDGET = {
+    "application": 9,
+    "application review: compare stats": 2,
+    "application review: accept": 4,
+    "log": 9,
+    "log review: accept": 3,
+}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self.before_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    async def measure(self, func: Callable[[], Awaitable[str]], expected: str) -> int:
+        start = self.count
+        outcome = await func()
+        if outcome != expected:
+            raise Exception(f"Flow ended with {outcome} instead of {expected}")
+        return self.count - start
+
+
+async def review(test: LoadTest, kind: str, review_id: int, message_id: int, action: str) -> str:
+    # Clicks a button of a review message like ReviewInteractions gets it from discord
+    channel_key = ConfigKey.GEAR_REVIEW_CHANNEL_ID if kind == "application" else ConfigKey.LOG_REVIEW_CHANNEL_ID
+    message = test.bot.get_channel(Config.get_int(channel_key)).messages[message_id]
+    interaction = test.interaction(test.admin, message)
+    interaction.data = {"custom_id": f"{test.bot.user.id}-{kind}-{review_id}:{action}"}
+    await ReviewInteractions(test.bot).on_interaction(interaction)
+    modal = interaction.response.modal
+    if not modal:
+        return "sent" if interaction.messages else "error"
+
+    interaction = test.interaction(test.admin, message)
+    modal.feedback._refresh_state(interaction, {"value": "Bench review"})
+    if not await test.dispatch_modal(f"{kind} review", modal, interaction):
+        return "error"
+    return "reviewed"
+
+
+async def run(args: argparse.Namespace) -> dict:
+    await setup_db()
+    stand_in = StandInProcess(get_stand_in_port(), [])
+    await stand_in.start()
+    bot = FakeBot()
+    log_queue = LogQueue(bot)
+    bot.cogs["LogQueue"] = log_queue
+    await log_queue.cog_load()
+    test = LoadTest(args, bot, FakeGuild(bot))
+    counter = QueryCounter()
+    counts = {}
+    try:
+        if await test.run_builds() != "done":
+            raise Exception("Could not import the builds from the stand-in")
+        # Warm-up, the first run fills the item catalogue
+        await counter.measure(lambda: test.run_application(0), "manual_review")
+        await counter.measure(lambda: test.run_log(1), "review")
+
+        counts["application"] = await counter.measure(lambda: test.run_application(2), "manual_review")
+        async with Session() as session:
+            stmt = select(Application.id, Application.review_message_id).where(Application.discord_user_id == test.users[2].id)
+            application = (await session.execute(stmt)).one()
+        counts["application review: compare stats"] = await counter.measure(
+            lambda: review(test, "application", application.id, application.review_message_id, "stats"), "sent")
+        counts["application review: accept"] = await counter.measure(
+            lambda: review(test, "application", application.id, application.review_message_id, "accept"), "reviewed")
+
+        counts["log"] = await counter.measure(lambda: test.run_log(3), "review")
+        async with Session() as session:
+            stmt = select(Log.id, Log.review_message_id).where(Log.discord_user_id == test.users[3].id)
+            log = (await session.execute(stmt)).one()
+        counts["log review: accept"] = await counter.measure(
+            lambda: review(test, "log", log.id, log.review_message_id, "accept"), "reviewed")
+    finally:
+        await log_queue.cog_unload()
+        await stand_in.stop()
+        await API.close_session()
+        await engine.dispose()
+        shutdown_pool()
+    if test.errors:
+        raise Exception(f"Handlers failed: {dict(test.errors)}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for the result of a log")
+    parser.add_argument("--verbose", action="store_true", help="Print the tracebacks of failed handlers")
+    args = parser.parse_args()
+    try:
+        counts = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(os.environ["BENCH_TMP_DIR"], ignore_errors=True)
+
+    results = {flow: {"queries": count, "budget": QUERY_BUDGET[flow]} for flow, count in counts.items()}
+    print(json.dumps(results, indent=2))
+    over = {flow: count - QUERY_BUDGET[flow] for flow, count in counts.items() if count > QUERY_BUDGET[flow]}
+    if over:
+        print(f"More queries than budgeted: {', '.join(f'{flow} (+{count})' for flow, count in over.items())}", file=sys.stderr)
+        sys.exit(1)
+
+
+# Worker processes import this module as well
+if __name__ == "__main__":
+    main()
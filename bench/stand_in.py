@@ -0,0 +1,239 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from collections import Counter
+from typing import Dict, List
+import aiohttp
+from aiohttp import web
+from fixtures import load_fixtures
+
+# Local stand-in for the GW2 API, dps.report and Snow Crows that replays the fixtures.
+# Usage: python bench/stand_in.py [--port 8089] [--latency 50] [--jitter 20] [--error-rate 0.01]
+#        [--rate-limit-rate 0.05] [--cloudflare-rate 0.1] [--fixtures recorded.json] [--log-scale 1]
+# Point GW2_API_URL, DPS_REPORT_URL and SNOWCROWS_URL at the printed url.
+# GET /_stats returns the request and fault counts, POST /_config changes the latency and fault rates while running.
+
+CONFIG_KEYS = ("latency", "jitter", "error_rate", "rate_limit_rate", "cloudflare_rate")
+
+# GW2 API endpoints that need an API key
+AUTHENTICATED_ENDPOINTS = ("tokeninfo", "account", "account/masteries", "account/achievements", "characters")
+
+CLOUDFLARE_PAGE = ("<!DOCTYPE html><html lang=\"en-US\"><head><title>Just a moment...</title></head><body>"
+                   "<noscript>Enable JavaScript and cookies to continue</noscript>"
+                   "<div id=\"challenge-running\">Checking if the site connection is secure</div></body></html>")
+
+
+def get_fault(request: web.Request, service: str) -> web.Response | None:
+    # Returns the injected error response, if this request gets one
+    config = request.app["config"]
+    faults = request.app["faults"]
+    roll = random.random()
+    if service != "gw2":
+        if roll < config["cloudflare_rate"]:
+            faults[f"{service} cloudflare"] += 1
+            return web.Response(status=503, text=CLOUDFLARE_PAGE, content_type="text/html")
+        roll -= config["cloudflare_rate"]
+    if roll < config["rate_limit_rate"]:
+        faults[f"{service} 429"] += 1
+        if service == "gw2":
+            return web.json_response({"text": "too many requests"}, status=429)
+        return web.Response(status=429, text="Too Many Requests")
+    roll -= config["rate_limit_rate"]
+    if roll < config["error_rate"]:
+        status = random.choice((500, 502, 503))
+        faults[f"{service} {status}"] += 1
+        if service == "gw2" and status == 503:
+            return web.json_response({"text": "API not active"}, status=503)
+        return web.Response(status=status, text="<html><body><h1>Bad Gateway</h1></body></html>", content_type="text/html")
+    return None
+
+
+async def respond(request: web.Request, service: str, **kwargs) -> web.Response:
+    request.app["requests"][service] += 1
+    config = request.app["config"]
+    latency = config["latency"] + random.uniform(0, config["jitter"])
+    if latency:
+        await asyncio.sleep(latency / 1000)
+    # A web.Response is an empty mapping and always false, so `or` would drop the fault
+    fault = get_fault(request, service)
+    return fault if fault is not None else web.Response(**kwargs)
+
+
+def json_response(data) -> dict:
+    return {"text": json.dumps(data), "content_type": "application/json"}
+
+
+def get_api_key(request: web.Request) -> str | None:
+    authorization = request.headers.get("Authorization", "")
+    return authorization.removeprefix("Bearer ").strip() if authorization.startswith("Bearer ") else None
+
+
+async def gw2(request: web.Request) -> web.Response:
+    fixtures = request.app["fixtures"]["gw2"]
+    endpoint = request.match_info["endpoint"].strip("/")
+    name, _, item_id = endpoint.partition("/")
+
+    # items?ids=1,2,3 and items/1
+    if name in ("items", "itemstats") and ("ids" in request.query or item_id.isdecimal()):
+        ids = [int(i) for i in request.query["ids"].split(",") if i.isdecimal()] if "ids" in request.query else [int(item_id)]
+        entries = [fixtures[name][i] for i in ids if i in fixtures[name]]
+        if not entries:
+            return await respond(request, "gw2", status=404, **json_response({"text": "all ids provided are invalid"}))
+        if "ids" not in request.query:
+            return await respond(request, "gw2", **json_response(entries[0]))
+        return await respond(request, "gw2", status=200 if len(entries) == len(ids) else 206, **json_response(entries))
+
+    if endpoint in AUTHENTICATED_ENDPOINTS:
+        api_key = get_api_key(request)
+        if not api_key:
+            return await respond(request, "gw2", status=401, **json_response({"text": "Invalid access token"}))
+        if endpoint == "characters" and "id" in request.query:
+            # Every character name gets the same character so each request can use a new name
+            return await respond(request, "gw2", **json_response(fixtures["character"] | {"name": request.query["id"]}))
+        if endpoint == "characters":
+            # Every API key has its own character, see get_character_name
+            return await respond(request, "gw2", **json_response([get_character_name(api_key)]))
+        if endpoint == "tokeninfo":
+            return await respond(request, "gw2", **json_response(fixtures["tokeninfo"] | {"id": api_key}))
+        return await respond(request, "gw2", **json_response(fixtures[endpoint]))
+    return await respond(request, "gw2", status=404, **json_response({"text": "not found"}))
+
+
+def get_character_name(api_key: str) -> str:
+    return f"Bench Character {api_key.rsplit('-', 1)[-1]}"
+
+
+async def dps_report(request: web.Request) -> web.Response:
+    logs = request.app["logs"]
+    permalink = request.query.get("permalink", "").strip().rstrip("/").rsplit("/", 1)[-1]
+    # Any permalink ending in _<encounter> returns that encounter, so every simulated user can submit a different log
+    body = logs.get(permalink) or logs.get(f"bench-{permalink.rsplit('_', 1)[-1]}")
+    if body is None:
+        return await respond(request, "dps_report", status=404, **json_response({"error": "Log not found"}))
+    return await respond(request, "dps_report", body=body, content_type="application/json")
+
+
+async def snowcrows(request: web.Request) -> web.Response:
+    page = request.app["fixtures"]["snowcrows"].get(request.path.strip("/"))
+    if page is None:
+        return await respond(request, "snowcrows", status=404, text="Not found")
+    return await respond(request, "snowcrows", text=page, content_type="text/html")
+
+
+async def stats(request: web.Request) -> web.Response:
+    return web.json_response({"requests": request.app["requests"], "faults": request.app["faults"]})
+
+
+async def config(request: web.Request) -> web.Response:
+    changes = await request.json()
+    request.app["config"].update({key: float(value) for key, value in changes.items() if key in CONFIG_KEYS})
+    return web.json_response(request.app["config"])
+
+
+def create_app(fixtures: dict, latency: float = 0, jitter: float = 0, error_rate: float = 0,
+               rate_limit_rate: float = 0, cloudflare_rate: float = 0) -> web.Application:
+    app = web.Application()
+    app["fixtures"] = fixtures
+    app["config"] = {"latency": latency, "jitter": jitter, "error_rate": error_rate,
+                     "rate_limit_rate": rate_limit_rate, "cloudflare_rate": cloudflare_rate}
+    app["requests"] = Counter()
+    app["faults"] = Counter()
+    # Logs are serialized once so the stand-in doesn't spend the time on every request
+    app["logs"] = {permalink: json.dumps(log_json).encode() for permalink, log_json in fixtures["dps_report"].items()}
+    app.router.add_get("/v2/{endpoint:.*}", gw2)
+    app.router.add_get("/getJson", dps_report)
+    app.router.add_get("/builds/{path:.*}", snowcrows)
+    app.router.add_get("/_stats", stats)
+    app.router.add_post("/_config", config)
+    return app
+
+
+class StandInProcess:
+    # Runs the stand-in in its own process so the fixtures and the server don't show up in the measurements
+    def __init__(self, port: int, args: List[str]):
+        self.url = f"http://127.0.0.1:{port}"
+        self.command = [sys.executable, os.path.abspath(__file__), "--port", str(port)] + args
+        self.process: asyncio.subprocess.Process | None = None
+        self.session: aiohttp.ClientSession | None = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(*self.command, stdout=asyncio.subprocess.PIPE)
+        line = await asyncio.wait_for(self.process.stdout.readline(), 60)
+        if not line.startswith(b"Listening on"):
+            raise Exception("Stand-in server did not start")
+        self.session = aiohttp.ClientSession()
+
+    async def stop(self):
+        if self.session:
+            await self.session.close()
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            await self.process.wait()
+
+    async def stats(self) -> Dict[str, Dict[str, int]]:
+        async with self.session.get(f"{self.url}/_stats") as r:
+            return await r.json()
+
+    async def requests(self) -> Dict[str, int]:
+        return (await self.stats())["requests"]
+
+    async def configure(self, **changes) -> dict:
+        async with self.session.post(f"{self.url}/_config", json=changes) as r:
+            return await r.json()
+
+    async def check_faults(self):
+        # Makes sure every kind of injected fault reaches the client, leaves all faults turned off
+        checks = [
+            ({"error_rate": 1}, "/v2/items/1", (500, 502, 503), None),
+            ({"rate_limit_rate": 1}, "/v2/items/1", (429,), None),
+            ({"cloudflare_rate": 1}, "/getJson?permalink=check", (503,), "Just a moment..."),
+        ]
+        off = {key: 0 for key in CONFIG_KEYS}
+        try:
+            for changes, path, statuses, text in checks:
+                await self.configure(**off | changes)
+                async with self.session.get(f"{self.url}{path}") as r:
+                    body = await r.text()
+                if r.status not in statuses or (text and text not in body):
+                    raise Exception(f"Stand-in did not inject {changes}, got status {r.status}")
+        finally:
+            await self.configure(**off)
+
+
+async def serve(app: web.Application, host: str, port: int):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = runner.addresses[0][1]
+    # StandInProcess waits for this line
+    print(f"Listening on http://{host}:{port}", flush=True)
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0, help="Up to this many milliseconds are added on top")
+    parser.add_argument("--error-rate", type=float, default=0, help="Share of responses that are a 500, 502 or 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0, help="Share of responses that are a 429")
+    parser.add_argument("--cloudflare-rate", type=float, default=0,
+                        help="Share of dps.report and Snow Crows responses that are a Cloudflare challenge")
+    parser.add_argument("--fixtures", help="Json file with recorded responses, see fixtures.py")
+    parser.add_argument("--log-scale", type=int, default=1, help="Makes the generated logs larger")
+    args = parser.parse_args()
+    app = create_app(load_fixtures(args.fixtures, args.log_scale), args.latency, args.jitter, args.error_rate,
+                     args.rate_limit_rate, args.cloudflare_rate)
+    try:
+        asyncio.run(serve(app, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
-from typing import List
-from sqlalchemy import select
-from database import Session
+import asyncio
+import os
+import aiohttp
+from collections import Counter
+from typing import List, Dict, Iterable, Tuple
 from exceptions import APIException
-from models.boss import Boss
+from helpers.item_catalog import read_catalog, write_catalog
+from helpers.rules import RuleIndex, BossRule
 from models.enums.pools import KillProofPool
 from models.feedback import *
 from aiohttp_client_cache import CachedSession, SQLiteBackend
@@ -13,7 +16,26 @@ from models.item import Item
 from models.stats import EquipmentStats
 
 
+# Maximum amount of ids the API accepts for a single bulk request
+BULK_ID_LIMIT = 200
+# Endpoints where concurrent identical requests are merged into one, bulk requests are merged per id (see fetch_bulk)
+COALESCED_ENDPOINTS = ("characters",)
+# Endpoints that return different data per API key
+AUTHENTICATED_ENDPOINTS = ("characters",)
+# Can be pointed at a local stand-in server (see bench/)
+GW2_API_URL = os.getenv("GW2_API_URL", "https://api.guildwars2.com").rstrip("/")
+
+
 class API:
+    # Process-wide HTTP client shared by all API instances (see open_session)
+    session: CachedSession | None = None
+    # Requests that are currently running, see get_endpoint_v2
+    in_flight: Dict[Tuple[str, str | None], asyncio.Task] = {}
+    # Bulk requests that are currently running, per endpoint and id, see fetch_bulk
+    in_flight_ids: Dict[Tuple[str, int], asyncio.Task] = {}
+    # endpoint -> coalescing hits/misses
+    coalescing_stats: Dict[str, Counter] = {}
+
     def __init__(self, api_key: str = None, version: str = "2021-07-24T00%3A00%3A00Z"):
         self.api_key = api_key
         self.version = version
@@ -24,21 +46,64 @@ class API:
         if self.version:
             self.headers["X-Schema-Version"] = self.version
 
-        self.cache = SQLiteBackend(
+    @staticmethod
+    def open_session() -> CachedSession:
+        if API.session and not API.session.closed:
+            return API.session
+
+        cache = SQLiteBackend(
             cache_name="api-cache.db",
             allowed_codes=(200,),
+            # Items and itemstats are stored in the item catalogue instead (see helpers/item_catalog.py)
             urls_expire_after={
-                "https://api.guildwars2.com/v2/items": 60*60*24*7,      # Cache items for 1 week
-                "https://api.guildwars2.com/v2/itemstats": 60*60*24*7,  # Cache item stats for 1 week
-                "https://api.guildwars2.com/v2/characters?id=*": 60,    # Cache characters for 1 min
-                "https://api.guildwars2.com/": 0,                       # Don't cache anything else
+                f"{GW2_API_URL}/v2/characters?id=*": 60,    # Cache characters for 1 min
+                f"{GW2_API_URL}/": 0,                        # Don't cache anything else
             })
+        # Keep connections to the API alive and cache DNS lookups so requests don't pay for a new handshake
+        connector = aiohttp.TCPConnector(limit_per_host=int(os.getenv("API_CONNECTION_LIMIT", "20")),
+                                         ttl_dns_cache=300, keepalive_timeout=60)
+        API.session = CachedSession(cache=cache, connector=connector)
+        return API.session
+
+    @staticmethod
+    async def close_session() -> None:
+        if API.session:
+            await API.session.close()
+            # Closing the session doesn't close the connections of the cache, they would keep the process alive
+            await API.session.cache.close()
+            API.session = None
 
     async def get_endpoint_v2(self, endpoint: str):
-        url = f"https://api.guildwars2.com/v2/{endpoint}"
-        async with CachedSession(cache=self.cache) as session:
-            resp = await session.get(url, headers=self.headers)
-            if resp.status in (200, 401):
+        name = endpoint.split("?")[0].split("/")[0]
+        if name not in COALESCED_ENDPOINTS:
+            return await self.__request(endpoint)
+
+        # Concurrent requests for the same url share one request
+        key = (endpoint, self.headers.get("Authorization") if name in AUTHENTICATED_ENDPOINTS else None)
+        counters = API.coalescing_stats.setdefault(name, Counter())
+        task = API.in_flight.get(key)
+        if task:
+            counters["hits"] += 1
+        else:
+            counters["misses"] += 1
+            task = asyncio.ensure_future(self.__request(endpoint))
+            API.in_flight[key] = task
+            task.add_done_callback(lambda t: API.__request_done(key, t))
+        # Don't cancel the request for everyone else if one caller gets cancelled
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def __request_done(key: Tuple[str, str | None], task: asyncio.Task) -> None:
+        if API.in_flight.get(key) is task:
+            del API.in_flight[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def __request(self, endpoint: str):
+        url = f"{GW2_API_URL}/v2/{endpoint}"
+        async with API.open_session().get(url, headers=self.headers) as resp:
+            if resp.status in (200, 206, 401):
                 return await resp.json()
             else:
                 try:
@@ -82,10 +147,61 @@ class API:
         return await self.get_endpoint_v2(f"characters?id={character_name}")
 
     async def get_item(self, item_id: int):
-        return await self.get_endpoint_v2(f"items/{item_id}")
+        return (await self.get_items([item_id]))[int(item_id)]
 
     async def get_item_stats(self, item_id: int):
-        return await self.get_endpoint_v2(f"itemstats/{item_id}")
+        return (await self.get_items_stats([item_id]))[int(item_id)]
+
+    async def get_items(self, item_ids: Iterable[int], strict: bool = True) -> Dict[int, dict]:
+        return await self.__get_bulk("items", item_ids, strict)
+
+    async def get_items_stats(self, stats_ids: Iterable[int], strict: bool = True) -> Dict[int, dict]:
+        return await self.__get_bulk("itemstats", stats_ids, strict)
+
+    async def __get_bulk(self, endpoint: str, ids: Iterable[int], strict: bool = True) -> Dict[int, dict]:
+        ids = sorted(set(int(i) for i in ids))
+
+        # Read the local catalogue first and only ask the API for unknown ids
+        results = await read_catalog(endpoint, ids)
+        unknown = [i for i in ids if i not in results]
+        if unknown:
+            results |= await write_catalog(endpoint, (await self.fetch_bulk(endpoint, unknown)).values())
+
+        # The API silently leaves out unknown ids (206 Partial Content)
+        missing = [str(i) for i in ids if i not in results]
+        if missing and strict:
+            raise APIException(f"{GW2_API_URL}/v2/{endpoint}?ids={','.join(missing)}", 404, {"text": "no such id"})
+        return results
+
+    async def fetch_bulk(self, endpoint: str, ids: Iterable[int]) -> Dict[int, dict]:
+        ids = sorted(set(int(i) for i in ids))
+        # Ids that another caller is already requesting share that request, only the rest is requested here
+        shared = {API.in_flight_ids[(endpoint, i)] for i in ids if (endpoint, i) in API.in_flight_ids}
+        new_ids = [i for i in ids if (endpoint, i) not in API.in_flight_ids]
+        counters = API.coalescing_stats.setdefault(endpoint, Counter())
+        counters["hits"] += len(ids) - len(new_ids)
+        counters["misses"] += len(new_ids)
+
+        tasks = []
+        for chunk in [new_ids[i:i + BULK_ID_LIMIT] for i in range(0, len(new_ids), BULK_ID_LIMIT)]:
+            task = asyncio.ensure_future(self.__request(f"{endpoint}?ids={','.join(str(i) for i in chunk)}"))
+            for i in chunk:
+                API.in_flight_ids[(endpoint, i)] = task
+            task.add_done_callback(lambda t, chunk=chunk: API.__bulk_request_done(endpoint, chunk, t))
+            tasks.append(task)
+        # Don't cancel the requests for everyone else if one caller gets cancelled
+        responses = await asyncio.gather(*[asyncio.shield(task) for task in shared | set(tasks)])
+        entries = {entry["id"]: entry for response in responses for entry in response}
+        return {i: entries[i] for i in ids if i in entries}
+
+    @staticmethod
+    def __bulk_request_done(endpoint: str, ids: List[int], task: asyncio.Task) -> None:
+        for i in ids:
+            if API.in_flight_ids.get((endpoint, i)) is task:
+                del API.in_flight_ids[(endpoint, i)]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not task.cancelled():
+            task.exception()
 
     async def check_mastery(self) -> FeedbackGroup:
         fbg = FeedbackGroup("Masteries")
@@ -113,36 +229,33 @@ class API:
         return fbg
 
     async def check_kp(self, tier: int) -> FeedbackGroup:
-        # load all relevant bosses from database
-        async with Session.begin() as session:
-            bosses = (await session.execute(select(Boss).where(Boss.kp_pool != KillProofPool.NOT_ALLOWED))).scalars().all()
-
-            # get achievements of player
-            achievements = await self.get_endpoint_v2("account/achievements")
-
-            # check achievements
-            bosses_killed = []
-            for achievement in achievements:
-                for boss in bosses:
-                    # check if achievement is relevant and if it is done
-                    if boss.achievement_id == achievement["id"]:
-                        if achievement["done"]:
-                            bosses_killed.append(boss)
-
-
-
-            match tier:
-                case 1:
-                    return self.__check_kp_t1(bosses_killed, len(bosses))
-                case 2:
-                    return self.__check_kp_t2(bosses_killed, len(bosses))
-                case 3:
-                    bosses_missing = [boss for boss in bosses if boss not in bosses_killed]
-                    return self.__check_kp_t3(bosses_killed, bosses_missing, len(bosses))
-                case _:
-                    raise ValueError("Invalid tier")
-
-    def __check_kp_t1(self, bosses_killed: List[Boss], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
+        # get all relevant bosses
+        bosses = [boss for boss in RuleIndex.current.bosses if boss.kp_pool != KillProofPool.NOT_ALLOWED]
+
+        # get achievements of player
+        achievements = await self.get_endpoint_v2("account/achievements")
+
+        # check achievements
+        bosses_killed = []
+        for achievement in achievements:
+            for boss in bosses:
+                # check if achievement is relevant and if it is done
+                if boss.achievement_id == achievement["id"]:
+                    if achievement["done"]:
+                        bosses_killed.append(boss)
+
+        match tier:
+            case 1:
+                return self.__check_kp_t1(bosses_killed, len(bosses))
+            case 2:
+                return self.__check_kp_t2(bosses_killed, len(bosses))
+            case 3:
+                bosses_missing = [boss for boss in bosses if boss not in bosses_killed]
+                return self.__check_kp_t3(bosses_killed, bosses_missing, len(bosses))
+            case _:
+                raise ValueError("Invalid tier")
+
+    def __check_kp_t1(self, bosses_killed: List[BossRule], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
         if not fbg:
             fbg = FeedbackGroup("Killproof")
         # check if at least 5 different bosses were killed
@@ -152,7 +265,7 @@ class API:
             fbg.add(Feedback(f"You have killed {len(bosses_killed)}/{max_bosses} different bosses (5 required)", FeedbackLevel.ERROR))
         return fbg
 
-    def __check_kp_t2(self, bosses_killed: List[Boss], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
+    def __check_kp_t2(self, bosses_killed: List[BossRule], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
         if not fbg:
             fbg = FeedbackGroup("Killproof")
         # count the amount of restricted boss kills and remove them from the list
@@ -176,7 +289,7 @@ class API:
                              f"In total you need 10 different boss kills with a minimum of 5 from pool B.", FeedbackLevel.ERROR))
         return fbg
 
-    def __check_kp_t3(self, bosses_killed: List[Boss], bosses_missing: List[Boss], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
+    def __check_kp_t3(self, bosses_killed: List[BossRule], bosses_missing: List[BossRule], max_bosses: int, fbg: FeedbackGroup = None) -> FeedbackGroup:
         if not fbg:
             fbg = FeedbackGroup("Killproof")
         # check if all bosses were killed
@@ -214,8 +327,9 @@ class API:
         if not equipment_tab_items:
             raise Exception("Equipment Tab not found")
 
-        equipment = Equipment()
-        stats = EquipmentStats()
+        # Collect all equipped items first so every item can be resolved with a few bulk requests
+        tab_items = []
+        item_ids = set()
         for equipment_tab_item in equipment_tab_items["equipment"]:
             # Skip items like underwater weapons and aqua breather
             try:
@@ -223,10 +337,41 @@ class API:
             except KeyError:
                 continue
 
+            # Stats and infusions are missing in the equipment tab for some items, use the character equipment instead
+            stats_item = self.__find_character_item(char_data, equipment_tab_item["id"], tab, "stats")
+            if "infusions" in equipment_tab_item:
+                infusions = equipment_tab_item["infusions"]
+            else:
+                character_item = self.__find_character_item(char_data, equipment_tab_item["id"], tab, "infusions")
+                infusions = character_item["infusions"] if character_item else []
+
+            tab_items.append((equipment_tab_item, stats_item, infusions))
+            item_ids.add(equipment_tab_item["id"])
+            item_ids.update(equipment_tab_item.get("upgrades", []))
+            item_ids.update(infusions)
+        items_data = await self.get_items(item_ids)
+
+        # Determine the stats of every item and resolve them in bulk
+        items_stats = []
+        for equipment_tab_item, stats_item, _ in tab_items:
+            item_data = items_data[equipment_tab_item["id"]]
+            if "stats" in equipment_tab_item:
+                items_stats.append((equipment_tab_item["stats"]["id"], equipment_tab_item["stats"], None))
+            elif "infix_upgrade" in item_data["details"]:
+                items_stats.append((item_data["details"]["infix_upgrade"]["id"], None, item_data["details"]["infix_upgrade"]))
+            elif stats_item:
+                items_stats.append((stats_item["stats"]["id"], stats_item["stats"], None))
+            else:
+                items_stats.append((None, None, None))
+        stats_data = await self.get_items_stats(stats_id for stats_id, _, _ in items_stats if stats_id)
+
+        equipment = Equipment()
+        stats = EquipmentStats()
+        for (equipment_tab_item, _, infusions), (stats_id, item_stats, infix_upgrade) in zip(tab_items, items_stats):
+            item_data = items_data[equipment_tab_item["id"]]
             item = Item()
             item.item_id = equipment_tab_item["id"]
             item.slot = EquipmentSlot[equipment_tab_item["slot"]]
-            item_data = await self.get_item(equipment_tab_item['id'])
             item.name = item_data["name"]
             item.rarity = Rarity[item_data["rarity"]]
             item.level = item_data["level"]
@@ -236,43 +381,29 @@ class API:
             else:
                 item.type = equipment_tab_item["slot"]
 
-            if "stats" in equipment_tab_item:
-                stats_id = equipment_tab_item["stats"]["id"]
-                stats.add_attributes(item.slot, stats=equipment_tab_item["stats"])
-            elif "infix_upgrade" in item_data["details"]:
-                stats_id = item_data["details"]["infix_upgrade"]["id"]
-                stats.add_attributes(item.slot, infix_upgrade=item_data["details"]["infix_upgrade"])
-            else:
-                for equipment_item in char_data["equipment"]:
-                    if item.item_id == equipment_item["id"] and equipment_tab_items["tab"] in equipment_item["tabs"] and "stats" in equipment_item:
-                        stats_id = equipment_item["stats"]["id"]
-                        stats.add_attributes(item.slot, stats=equipment_item["stats"])
-                        break
-                else:
-                    stats_id = None
+            if item_stats:
+                stats.add_attributes(item.slot, stats=item_stats)
+            elif infix_upgrade:
+                stats.add_attributes(item.slot, infix_upgrade=infix_upgrade)
 
             if stats_id:
-                stats_data = await self.get_item_stats(stats_id)
-                item.stats = stats_data["name"]
+                item.stats = stats_data[stats_id]["name"]
             else:
                 item.stats = "none"
 
-            if "upgrades" in equipment_tab_item:
-                for upgrade_data in equipment_tab_item["upgrades"]:
-                    item.add_upgrade((await self.get_item(upgrade_data))["name"])
+            for upgrade in equipment_tab_item.get("upgrades", []):
+                item.add_upgrade(items_data[upgrade]["name"])
 
-            if "infusions" in equipment_tab_item:
-                for infusion in equipment_tab_item["infusions"]:
-                    infusion_data = await self.get_item(infusion)
-                    stats.add_attributes(item.slot, infix_upgrade=infusion_data["details"]["infix_upgrade"])
-            else:
-                for equipment_item in char_data["equipment"]:
-                    if item.item_id == equipment_item["id"] and equipment_tab_items["tab"] in equipment_item["tabs"] and "infusions" in equipment_item:
-                        for infusion in equipment_item["infusions"]:
-                            infusion_data = await self.get_item(infusion)
-                            stats.add_attributes(item.slot, infix_upgrade=infusion_data["details"]["infix_upgrade"])
-                        break
+            for infusion in infusions:
+                stats.add_attributes(item.slot, infix_upgrade=items_data[infusion]["details"]["infix_upgrade"])
 
             equipment.add_item(item)
         equipment.stats = stats
         return equipment
+
+    @staticmethod
+    def __find_character_item(char_data: dict, item_id: int, tab: int, key: str) -> dict | None:
+        for equipment_item in char_data["equipment"]:
+            if item_id == equipment_item["id"] and tab in equipment_item["tabs"] and key in equipment_item:
+                return equipment_item
+        return None
@@ -1,13 +1,24 @@
+import asyncio
+import statistics
+import time
 import traceback
 from io import BytesIO
 
+import aiohttp
 import discord
 from discord import app_commands, Interaction, Embed
 from discord.ext import commands
 import typing
 from sqlalchemy import select, func, desc, delete
+from sqlalchemy.orm import joinedload
+from api import API
 from database import Session
 from helpers.custom_embed import CustomEmbed
+from helpers.dps_report import download_stats, LOG_DOWNLOAD_CONCURRENCY
+from helpers.embeds import split_embed
+from helpers.log_revalidation import revalidate_pending_logs, PASSED, DENIED, SKIPPED, FAILED
+from helpers.logging import log_to_channel
+from helpers.rules import RuleIndex
 from models.application import Application
 from models.boss import Boss
 from models.build import Build
@@ -17,7 +28,7 @@ from models.enums.config_key import ConfigKey
 from models.enums.pools import KillProofPool, BossLogPool
 from models.enums.profession import Profession
 from models.feedback import FeedbackLevel
-from snowcrows import get_sc_build, get_sc_builds
+from snowcrows import get_sc_build, get_sc_builds, import_sc_builds, SNOWCROWS_URL
 from views.application_overview import ApplicationOverview
 
 
@@ -114,7 +125,7 @@ class AdminCommands(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     @build.command(name="add", description="Add a build to the database")
     async def build_add(self, interaction: Interaction, snowcrows_url: str):
-        if not snowcrows_url.startswith("https://snowcrows.com"):
+        if not snowcrows_url.startswith(SNOWCROWS_URL):
             await interaction.response.send_message("Invalid url", ephemeral=True)
             return
 
@@ -133,7 +144,7 @@ class AdminCommands(commands.Cog):
     @app_commands.checks.has_permissions(administrator=True)
     @build.command(name="archive", description="Removes the build from the list of allowed builds")
     async def build_archive(self, interaction: Interaction, snowcrows_url: str):
-        if not snowcrows_url.startswith("https://snowcrows.com"):
+        if not snowcrows_url.startswith(SNOWCROWS_URL):
             await interaction.response.send_message("Invalid url", ephemeral=True)
             return
 
@@ -152,27 +163,51 @@ class AdminCommands(commands.Cog):
     async def build_init(self, interaction: Interaction):
         await interaction.response.defer(thinking=True, ephemeral=True)
         errors = ""
+
+        # Find the build urls of all professions
+        async with aiohttp.ClientSession() as session:
+            profession_urls = await asyncio.gather(*[get_sc_builds(profession, session) for profession in Profession],
+                                                   return_exceptions=True)
+        # A build can be listed for more than one profession, it is only imported once
+        urls = list(dict.fromkeys(url for urls in profession_urls if not isinstance(urls, Exception) for url in urls))
+
+        # Import all builds at once and show the progress every few seconds
+        done = 0
+        last_update = time.monotonic()
+        async def on_progress(url: str, error: Exception | None):
+            nonlocal done, last_update
+            done += 1
+            if time.monotonic() - last_update > 2 or done == len(urls):
+                last_update = time.monotonic()
+                await interaction.edit_original_response(content=f"Imported {done}/{len(urls)} builds")
+        results = await import_sc_builds(urls, on_progress)
+
         async with Session.begin() as session:
-            for profession in Profession:
-                urls = await get_sc_builds(profession)
+            for profession, urls in zip(Profession, profession_urls):
+                if isinstance(urls, Exception):
+                    print(f"Error finding builds for {profession.name}:\n{''.join(traceback.format_exception(urls))}")
+                    errors += f"Error finding builds for {profession.name}: {urls}\n"
+                    continue
+
                 new_builds = []
                 for url in urls:
-                    try:
-                        build_sc = await get_sc_build(url)
-                        new_builds.append(build_sc.name)
-                        build = await Build.find(session, name=build_sc.name)
-                        # If the build already exists in the DB: check if the gear is the same. if not archive old build
-                        if build:
-                            fbc = build.equipment.compare(build_sc.equipment)
-                            if fbc.level <= FeedbackLevel.SUCCESS:
-                                # Don't need to add it again if the gear is the same
-                                continue
-                            else:
-                                await build.archive()
-                        session.add(build_sc)
-                    except Exception as e:
-                        print(f"Error adding build {url}:\n{traceback.format_exc()}")
-                        errors += f"Error adding build {url}: {e}\n"
+                    build_sc = results[url]
+                    if isinstance(build_sc, Exception):
+                        print(f"Error adding build {url}:\n{''.join(traceback.format_exception(build_sc))}")
+                        errors += f"Error adding build {url}: {build_sc}\n"
+                        continue
+
+                    new_builds.append(build_sc.name)
+                    build = await Build.find(session, name=build_sc.name, options=[joinedload(Build.equipment)])
+                    # If the build already exists in the DB: check if the gear is the same. if not archive old build
+                    if build:
+                        fbc = build.equipment.compare(build_sc.equipment)
+                        if fbc.level <= FeedbackLevel.SUCCESS:
+                            # Don't need to add it again if the gear is the same
+                            continue
+                        else:
+                            await build.archive()
+                    session.add(build_sc)
 
                 # Archive builds that are not in the list of new builds
                 for build in await Build.from_profession(session, profession):
@@ -181,6 +216,34 @@ class AdminCommands(commands.Cog):
 
         await interaction.followup.send(f"Added all recommended and viable builds (hand kite builds were ignored)\n{errors}", ephemeral=True)
 
+    @app_commands.guild_only
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.command(name="revalidate_logs", description="Check all logs waiting for review again and deny the ones that fail now")
+    async def revalidate_logs(self, interaction: Interaction, concurrency: app_commands.Range[int, 1, 32] = 8):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+
+        # Show the progress every few seconds
+        last_update = time.monotonic()
+        async def on_progress(done: int, total: int):
+            nonlocal last_update
+            if time.monotonic() - last_update > 2 or done == total:
+                last_update = time.monotonic()
+                await interaction.edit_original_response(content=f"Checked {done}/{total} logs")
+        results, denied = await revalidate_pending_logs(self.bot, interaction.user.id, concurrency, on_progress)
+
+        embed = CustomEmbed(self.bot, title="Log Re-validation")
+        embed.description = f"**Reviewer:** {interaction.user.mention}\n" \
+                            f"**Still valid:** {results[PASSED]}\n" \
+                            f"**Denied:** {results[DENIED]}\n" \
+                            f"**Skipped:** {results[SKIPPED]} (reviewed meanwhile or submitted before the account name was stored)\n" \
+                            f"**Errors:** {results[FAILED]}"
+        if denied:
+            split_embed(embed, "Denied logs:", "".join(f"{log.id}: [{log.fight_name}]({log.log_url}) <@{log.discord_user_id}>\n"
+                                                     for log in sorted(denied, key=lambda log: log.id)))
+        await log_to_channel(self.bot, embed)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @app_commands.guild_only
     @app_commands.default_permissions(manage_roles=True)
     @app_commands.checks.has_permissions(manage_roles=True)
@@ -225,6 +288,39 @@ class AdminCommands(commands.Cog):
             embed.add_field(name="Most popular accepted builds:", value=v, inline=False)
         await interaction.followup.send(embed=embed)
 
+    @app_commands.guild_only
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.command(name="api_stats", description="Show how many GW2 API requests were shared between users")
+    async def api_stats(self, interaction: Interaction):
+        embed = CustomEmbed(self.bot, title="API Stats")
+        embed.description = f"**Requests in flight:** {len(API.in_flight) + len(set(API.in_flight_ids.values()))}"
+        v = ""
+        for endpoint, counters in API.coalescing_stats.items():
+            total = counters["hits"] + counters["misses"]
+            v += f"{endpoint}: {counters['hits']} shared / {total} lookups ({counters['hits'] / total:.0%})\n"
+        embed.add_field(name="Coalesced requests per endpoint:", value=v if v else "No requests yet", inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.guild_only
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.command(name="log_queue", description="Show the state of the log submission queue")
+    async def log_queue(self, interaction: Interaction):
+        queue = self.bot.get_cog("LogQueue")
+        embed = CustomEmbed(self.bot, title="Log Queue")
+        embed.description = f"**Waiting:** {queue.queue.qsize()}\n" \
+                            f"**Being checked:** {queue.processing}/{len(queue.workers)}\n" \
+                            f"**Downloading:** {download_stats['active']}/{LOG_DOWNLOAD_CONCURRENCY}\n" \
+                            f"**Queued since start:** {queue.stats['queued']}\n" \
+                            f"**Checked since start:** {queue.stats['processed']} ({queue.stats['failed']} failed)\n" \
+                            f"**Rejected duplicates:** {queue.stats['duplicates']}"
+        if queue.wait_times:
+            embed.add_field(name="Average wait:", value=f"{statistics.mean(queue.wait_times):.1f}s (max {max(queue.wait_times):.1f}s)")
+        if queue.process_times:
+            embed.add_field(name="Average check:", value=f"{statistics.mean(queue.process_times):.1f}s (max {max(queue.process_times):.1f}s)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
 
     boss = app_commands.Group(name="boss", description="Manage the list of bosses")
 
@@ -249,6 +345,7 @@ class AdminCommands(commands.Cog):
         async with Session.begin() as session:
             await session.execute(delete(Boss))
             await Boss.init(session)
+        await RuleIndex.reload()
         await interaction.response.send_message("Bosses initialized", ephemeral=True)
 
 
@@ -271,6 +368,7 @@ class AdminCommands(commands.Cog):
 
             boss = Boss(ei_encounter_id=ei_encounter_id, boss_name=boss_name, is_cm=is_cm, kp_pool=kp_pool, log_pool=log_pool, achievement_id=achievement_id)
             session.add(boss)
+        await RuleIndex.reload()
         await interaction.response.send_message("Boss added", ephemeral=True)
 
 
@@ -286,6 +384,7 @@ class AdminCommands(commands.Cog):
                 return
 
             await session.execute(delete(Boss).where(Boss.encounter_id == ei_encounter_id).where(Boss.is_cm == is_cm))
+        await RuleIndex.reload()
         await interaction.response.send_message("Boss deleted", ephemeral=True)
 
 
@@ -315,6 +414,8 @@ class AdminCommands(commands.Cog):
         async with Session.begin() as session:
             await session.execute(delete(Config))
             await Config.init(session, is_prod)
+        async with Session() as session:
+            await Config.load(session)
         await interaction.response.send_message("Config initialized", ephemeral=True)
 
     @app_commands.guild_only
@@ -329,4 +430,5 @@ class AdminCommands(commands.Cog):
                 session.add(config)
             else:
                 config.value = value
+        Config.set_cached(key, value)
         await interaction.response.send_message("Config updated", ephemeral=True)
@@ -0,0 +1,23 @@
+import traceback
+from discord.ext import commands, tasks
+from api import API
+from helpers.item_catalog import refresh_catalog, CATALOG_REFRESH_HOURS
+
+
+class CatalogTasks(commands.Cog):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        self.refresh.start()
+
+    async def cog_unload(self):
+        self.refresh.cancel()
+
+    @tasks.loop(hours=CATALOG_REFRESH_HOURS)
+    async def refresh(self):
+        try:
+            items, stats = await refresh_catalog(API())
+            print(f"Refreshed item catalogue: {items} items and {stats} item stats")
+        except Exception:
+            traceback.print_exc()
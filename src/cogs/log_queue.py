@@ -0,0 +1,213 @@
+import asyncio
+import datetime
+import os
+import time
+import traceback
+from collections import Counter, deque
+from typing import Deque, Dict, List, Set
+import discord
+from discord import Embed, Interaction
+from discord.ext import commands
+from sqlalchemy import select, update
+from database import Session
+from exceptions import LogException
+from helpers.custom_embed import CustomEmbed
+from helpers.dps_report import get_log_json
+from helpers.embeds import generate_error_embed, get_log_embed, get_error_message, invalidate_progress
+from helpers.log_checks import check_log
+from helpers.logging import log_to_channel
+from models.config import Config
+from models.enums.config_key import ConfigKey
+from models.enums.log_status import LogStatus
+from models.enums.log_submission_status import LogSubmissionStatus
+from models.enums.role import Role
+from models.feedback import FeedbackLevel
+from models.log import Log
+from models.log_submission import LogSubmission
+from views.log_review import LogReviewView
+from cogs.review_interactions import send_review_message
+
+LOG_QUEUE_WORKERS = int(os.getenv("LOG_QUEUE_WORKERS", "2"))
+
+# Followups only work for 15 minutes after the interaction, older submissions are answered with a DM
+FOLLOWUP_LIFETIME = datetime.timedelta(minutes=14)
+
+
+class LogQueue(commands.Cog):
+    # Checks submitted logs in the background, the submissions are stored in the database so none get lost on a restart
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.queue: asyncio.Queue[int] = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+        # Interactions of the submissions queued since the start, used to answer with a followup
+        self.interactions: Dict[int, Interaction] = {}
+        # Users with a pending submission, every user can only have one log in the queue
+        self.queued_users: Set[int] = set()
+        self.processing = 0
+        self.stats = Counter()
+        self.wait_times: Deque[float] = deque(maxlen=100)
+        self.process_times: Deque[float] = deque(maxlen=100)
+
+    async def cog_load(self):
+        async with Session.begin() as session:
+            # Submissions that were being checked when the bot stopped are checked again
+            await session.execute(update(LogSubmission).where(LogSubmission.status == LogSubmissionStatus.PROCESSING)
+                                  .values(status=LogSubmissionStatus.PENDING, started_at=None))
+            stmt = select(LogSubmission.id, LogSubmission.discord_user_id)\
+                .where(LogSubmission.status == LogSubmissionStatus.PENDING).order_by(LogSubmission.id)
+            for row in (await session.execute(stmt)).all():
+                self.queued_users.add(row.discord_user_id)
+                self.queue.put_nowait(row.id)
+        self.workers = [asyncio.create_task(self.worker()) for _ in range(LOG_QUEUE_WORKERS)]
+
+    async def cog_unload(self):
+        for worker in self.workers:
+            worker.cancel()
+
+    async def enqueue(self, interaction: Interaction, tier: int, role: Role, log_url: str, account_name: str) -> int | None:
+        # Returns the position in the queue or None if the user already has a log in the queue
+        if interaction.user.id in self.queued_users:
+            self.stats["duplicates"] += 1
+            return None
+        self.queued_users.add(interaction.user.id)
+
+        submission = LogSubmission()
+        submission.discord_user_id = interaction.user.id
+        submission.tier = tier
+        submission.role = role
+        submission.log_url = log_url
+        submission.account_name = account_name
+        try:
+            async with Session.begin() as session:
+                session.add(submission)
+                await session.flush()
+                submission_id = submission.id
+        except Exception:
+            self.queued_users.discard(interaction.user.id)
+            raise
+
+        self.interactions[submission_id] = interaction
+        self.queue.put_nowait(submission_id)
+        self.stats["queued"] += 1
+        return self.queue.qsize() + self.processing
+
+    async def worker(self):
+        # cog_load runs before the gateway is ready, the channels are not cached yet
+        await self.bot.wait_until_ready()
+        while True:
+            submission_id = await self.queue.get()
+            try:
+                await self.process(submission_id)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                self.queue.task_done()
+
+    async def process(self, submission_id: int):
+        async with Session.begin() as session:
+            submission = await session.get(LogSubmission, submission_id)
+            if not submission or submission.status != LogSubmissionStatus.PENDING:
+                return
+            submission.status = LogSubmissionStatus.PROCESSING
+            submission.started_at = datetime.datetime.utcnow()
+            await session.flush()
+            session.expunge(submission)
+        self.wait_times.append((submission.started_at - submission.created_at.replace(tzinfo=None)).total_seconds())
+
+        self.processing += 1
+        start = time.monotonic()
+        try:
+            embed = await self.check_submission(submission)
+        except Exception as error:
+            traceback.print_exc()
+            self.stats["failed"] += 1
+            async with Session.begin() as session:
+                await self.finish(session, submission_id, LogSubmissionStatus.FAILED, error=str(error))
+            embed = generate_error_embed(error)
+        finally:
+            self.processing -= 1
+            self.queued_users.discard(submission.discord_user_id)
+            self.process_times.append(time.monotonic() - start)
+        self.stats["processed"] += 1
+        await self.deliver(submission_id, submission.discord_user_id, embed)
+
+    async def check_submission(self, submission: LogSubmission) -> Embed:
+        user = self.bot.get_user(submission.discord_user_id) or await self.bot.fetch_user(submission.discord_user_id)
+        embed = CustomEmbed(self.bot, title="Log Feedback", color=FeedbackLevel.ERROR.colour)
+        embed.description = f"**User:** {user}\n**Log:** {submission.log_url}\n**Tier:** {submission.tier}\n**Role:** {submission.role.value}"
+
+        # Check if the log can be downloaded
+        try:
+            log_json = await get_log_json(submission.log_url)
+        except Exception as error:
+            if not isinstance(error, LogException):
+                traceback.print_exception(error)
+            embed.add_field(name=f"{FeedbackLevel.ERROR.emoji} Error while parsing log", value=get_error_message(error),
+                            inline=False)
+            await log_to_channel(self.bot, embed)
+            self.stats["failed"] += 1
+            async with Session.begin() as session:
+                await self.finish(session, submission.id, LogSubmissionStatus.FAILED, error=str(error))
+            return embed
+
+        # Create log
+        log = Log()
+        log.discord_user_id = submission.discord_user_id
+        log.tier = submission.tier
+        log.role = submission.role
+        log.encounter_id = log_json["eiEncounterID"]
+        log.fight_name = log_json["fightName"]
+        log.is_cm = log_json["isCM"]
+        log.log_url = submission.log_url
+        log.account_name = submission.account_name
+
+        # Check log
+        fbc = await check_log(log_json, submission.account_name, submission.tier, submission.discord_user_id, submission.log_url, log)
+        fbc.to_embed(embed)
+        if fbc.level == FeedbackLevel.SUCCESS:
+            embed.add_field(name="Log successfully submitted for manual review", value="", inline=False)
+
+        log.status = LogStatus.DENIED if fbc.level == FeedbackLevel.ERROR else LogStatus.WAITING_FOR_REVIEW
+
+        # The log and the result of the submission are saved together
+        async with Session.begin() as session:
+            session.add(log)
+            await session.flush()
+            await self.finish(session, submission.id, LogSubmissionStatus.DONE, log_id=log.id)
+
+            if log.status == LogStatus.DENIED:
+                await log_to_channel(self.bot, embed)
+                return embed
+
+            # Create review message
+            review_embed = get_log_embed(submission.log_url, log_json, user, submission.account_name, submission.role, submission.tier)
+            fbc.to_embed(review_embed)
+
+            view = LogReviewView(self.bot, log.id)
+            message = await send_review_message(self.bot.get_channel(Config.get_int(ConfigKey.LOG_REVIEW_CHANNEL_ID)),
+                                                review_embed, view)
+            log.review_message_id = message.id
+        invalidate_progress(submission.discord_user_id)
+        return embed
+
+    @staticmethod
+    async def finish(session, submission_id: int, status: LogSubmissionStatus, log_id: int = None, error: str = None):
+        stmt = update(LogSubmission).where(LogSubmission.id == submission_id)\
+            .values(status=status, log_id=log_id, error=error, finished_at=datetime.datetime.utcnow())
+        await session.execute(stmt)
+
+    async def deliver(self, submission_id: int, discord_user_id: int, embed: Embed):
+        interaction = self.interactions.pop(submission_id, None)
+        if interaction and discord.utils.utcnow() - interaction.created_at < FOLLOWUP_LIFETIME:
+            try:
+                await interaction.followup.send(embed=embed, ephemeral=True)
+                return
+            except discord.HTTPException:
+                traceback.print_exc()
+
+        # The interaction is too old or from before a restart
+        try:
+            user = self.bot.get_user(discord_user_id) or await self.bot.fetch_user(discord_user_id)
+            await user.send(embed=embed)
+        except discord.HTTPException:
+            print(f"Could not send the log feedback of submission {submission_id} to user {discord_user_id}")
@@ -0,0 +1,65 @@
+import re
+import discord
+from discord.ext import commands
+from sqlalchemy import select
+from database import Session
+from models.application import Application
+from models.log import Log
+from views.log_review import LogReviewView
+from views.review import ReviewView
+
+# {bot_id}-{application|log}-{id}:{action}
+REVIEW_CUSTOM_ID = re.compile(r"^(\d+)-(application|log)-(\d+):(\w+)$")
+
+
+async def send_review_message(channel: discord.abc.Messageable, embed: discord.Embed, view: discord.ui.View) -> discord.Message:
+    # The view only renders the buttons. Clicks are dispatched by ReviewInteractions, also after a restart,
+    # so the view is stopped instead of being kept in the view store until it is clicked
+    message = await channel.send(embed=embed, view=view)
+    view.stop()
+    return message
+
+
+class ReviewInteractions(commands.Cog):
+    # Handles the buttons of all review messages, the views are only created when a button is clicked
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_interaction(self, interaction: discord.Interaction):
+        if interaction.type != discord.InteractionType.component:
+            return
+        match = REVIEW_CUSTOM_ID.match(interaction.data.get("custom_id", ""))
+        if not match or int(match[1]) != self.bot.user.id:
+            return
+        kind, review_id, action = match[2], int(match[3]), match[4]
+
+        # Log reviews used to have the same custom ids as application reviews
+        if kind == "application":
+            kind = await self.get_review_kind(review_id, interaction.message.id)
+            # Drop buttons whose id doesn't belong to the application of this message
+            if not kind:
+                return
+
+        view = ReviewView(self.bot, review_id) if kind == "application" else LogReviewView(self.bot, review_id)
+        item = next((item for item in view.children if item.custom_id.endswith(f":{action}")), None)
+        if not item:
+            return
+        try:
+            if await view.interaction_check(interaction):
+                await item.callback(interaction)
+        except Exception as error:
+            await view.on_error(interaction, error, item)
+
+    @staticmethod
+    async def get_review_kind(review_id: int, message_id: int) -> str | None:
+        # "log" if the message belongs to a log, also one that was just reviewed and whose message isn't deleted yet.
+        # "application" if it belongs to the application with the id of the button, otherwise None
+        log = select(Log.id).where(Log.review_message_id == message_id).limit(1).scalar_subquery()
+        application = select(Application.id).where(Application.id == review_id)\
+            .where(Application.review_message_id == message_id).scalar_subquery()
+        async with Session() as session:
+            row = (await session.execute(select(log.label("log"), application.label("application")))).one()
+        if row.log is not None:
+            return "log"
+        return "application" if row.application is not None else None
@@ -11,3 +11,10 @@ class APIException(Exception):
             response_text = "unknown api error"
         self.error_message = f"{url} {response_code}: {response_text}"
         super().__init__(self.error_message)
+
+
+class LogException(Exception):
+
+    def __init__(self, log_url: str, message: str):
+        self.error_message = f"{log_url}\n{message}"
+        super().__init__(self.error_message)
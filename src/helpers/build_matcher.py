@@ -0,0 +1,120 @@
+from typing import Dict, List, NamedTuple, Tuple, Iterable
+from models.build import Build
+from models.enums.equipment_slot import EquipmentSlot
+from models.enums.rarity import Rarity
+from models.equipment import Equipment
+from models.feedback import FeedbackLevel
+
+
+class SlotSignature(NamedTuple):
+    stats: str
+    type: str
+    upgrades: Tuple[str, ...]
+    legendary: bool
+
+
+# Signatures of the build equipment, builds never change their gear (a new build gets created instead)
+build_signatures: Dict[int, Dict[str, SlotSignature]] = {}
+
+# Slots are looked up by their value, hashing strings is a lot faster than hashing enums
+SINGLE_SLOTS = [slot.value for slot in EquipmentSlot.get_armor_slots() + [EquipmentSlot.Backpack, EquipmentSlot.Amulet]]
+PAIRED_SLOTS = [(EquipmentSlot.Accessory1.value, EquipmentSlot.Accessory2.value), (EquipmentSlot.Ring1.value, EquipmentSlot.Ring2.value)]
+WEAPON_SLOTS = [slot.value for slot in EquipmentSlot.get_weapon_slots()]
+WEAPON_SETS = {slot: WEAPON_SLOTS[:2] if i < 2 else WEAPON_SLOTS[2:] for i, slot in enumerate(WEAPON_SLOTS)}
+WEAPON_PERMUTATIONS = [(0, 1, 2, 3), (0, 3, 2, 1), (2, 1, 0, 3), (2, 3, 0, 1)]
+
+SUCCESS = FeedbackLevel.SUCCESS.value
+WARNING = FeedbackLevel.WARNING.value
+ERROR = FeedbackLevel.ERROR.value
+
+
+def get_signature(equipment: Equipment) -> Dict[str, SlotSignature]:
+    return {item.slot.value: SlotSignature(item.stats, item.type, tuple(sorted(item.upgrades)), item.rarity == Rarity.Legendary)
+            for item in equipment.items}
+
+
+def get_build_signature(build: Build) -> Dict[str, SlotSignature]:
+    if build.id not in build_signatures:
+        build_signatures[build.id] = get_signature(build.equipment)
+    return build_signatures[build.id]
+
+
+def score_item(own: SlotSignature, other: SlotSignature, weapon: bool = False) -> Tuple[int, int]:
+    # Same rules as Item.compare
+    level = SUCCESS
+    mismatches = 0
+    if own.stats != other.stats:
+        level = WARNING
+        mismatches += 1
+    if len(own.upgrades) < len(other.upgrades):
+        if not (weapon and own.legendary):
+            return ERROR, mismatches + 1
+    elif own.upgrades != other.upgrades:
+        level = WARNING
+        mismatches += 1
+    return level, mismatches
+
+
+def score_weapons(own: Dict[str, SlotSignature], other: Dict[str, SlotSignature]) -> Tuple[int, int]:
+    # Same rules as Equipment.compare_weapons
+    weapons = tuple(own.get(slot) for slot in WEAPON_SLOTS)
+    best = None
+    for permutation in WEAPON_PERMUTATIONS:
+        level, mismatches = SUCCESS, 0
+        for slot, index in zip(WEAPON_SLOTS, permutation):
+            item = weapons[index]
+            if slot not in other:
+                if item and any(s in other for s in WEAPON_SETS[slot]):
+                    break
+                continue
+            if not item or item.type != other[slot].type:
+                break
+            item_level, item_mismatches = score_item(item, other[slot], True)
+            level = max(level, item_level)
+            mismatches += item_mismatches
+        else:
+            if not best or (level, mismatches) < best:
+                best = (level, mismatches)
+    # Wrong weapons
+    return best if best else (WARNING, len(WEAPON_SLOTS))
+
+
+def score_build(own: Dict[str, SlotSignature], other: Dict[str, SlotSignature]) -> Tuple[int, int]:
+    level, mismatches = SUCCESS, 0
+    for slot in SINGLE_SLOTS:
+        if slot not in other:
+            continue
+        if slot not in own:
+            level, mismatches = ERROR, mismatches + 1
+            continue
+        item_level, item_mismatches = score_item(own[slot], other[slot])
+        level = max(level, item_level)
+        mismatches += item_mismatches
+
+    # The order of accessories and rings doesn't matter
+    for slots in PAIRED_SLOTS:
+        if any(slot in other and slot not in own for slot in slots):
+            level, mismatches = ERROR, mismatches + 1
+            continue
+        own_stats = [own[slot].stats for slot in slots if slot in own]
+        for slot in slots:
+            if slot not in other:
+                continue
+            if other[slot].stats in own_stats:
+                own_stats.remove(other[slot].stats)
+            else:
+                level, mismatches = max(level, WARNING), mismatches + 1
+
+    weapons_level, weapons_mismatches = score_weapons(own, other)
+    return max(level, weapons_level), mismatches + weapons_mismatches
+
+
+def rank_builds(equipment: Equipment, builds: Iterable[Build]) -> List[Tuple[Build, FeedbackLevel, int]]:
+    # Best matching build first
+    own = get_signature(equipment)
+    ranking = []
+    for build in builds:
+        level, mismatches = score_build(own, get_build_signature(build))
+        ranking.append((build, FeedbackLevel(level), mismatches))
+    ranking.sort(key=lambda r: (r[1].value, r[2]))
+    return ranking
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from collections import Counter
+from typing import Dict
+import aiohttp
+import ijson
+from exceptions import LogException
+from helpers.log_cache import get_cached_log, cache_log
+
+MAX_LOG_SIZE = int(os.getenv("MAX_LOG_SIZE_MB", "100")) * 1024 * 1024
+LOG_DOWNLOAD_CONCURRENCY = int(os.getenv("LOG_DOWNLOAD_CONCURRENCY", "2"))
+DPS_REPORT_URL = os.getenv("DPS_REPORT_URL", "https://dps.report").rstrip("/")
+
+# Every download can hold a large log in memory while it is parsed
+download_semaphore = asyncio.Semaphore(LOG_DOWNLOAD_CONCURRENCY)
+download_stats = Counter()
+
+# Only these parts of the EI json are used by the log checks, everything else is skipped while parsing
+KEEP_PREFIXES = (
+    "eiEncounterID", "isCM", "gW2Build", "success", "fightName", "fightIcon", "duration",
+    "players.item.account", "players.item.name", "players.item.profession", "players.item.healing",
+    "players.item.defenses", "players.item.consumables",
+    "players.item.buffUptimes.item.id", "players.item.buffUptimes.item.buffData",
+    "mechanics.item.name", "mechanics.item.fullName", "mechanics.item.mechanicsData",
+)
+# Containers that lead to a kept prefix
+KEEP_PARENTS = {prefix.rsplit(".", i)[0] for prefix in KEEP_PREFIXES for i in range(1, prefix.count(".") + 1)} | {""}
+
+
+def is_kept(prefix: str) -> bool:
+    if prefix in KEEP_PARENTS:
+        return True
+    return any(prefix == keep or prefix.startswith(keep + ".") for keep in KEEP_PREFIXES)
+
+
+class BoundedReader:
+    def __init__(self, log_url: str, content: aiohttp.StreamReader):
+        self.log_url = log_url
+        self.content = content
+        self.size = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        data = await self.content.read(n)
+        self.size += len(data)
+        if self.size > MAX_LOG_SIZE:
+            raise LogException(self.log_url, f"Log is larger than {MAX_LOG_SIZE // (1024 * 1024)} MB")
+        return data
+
+
+async def parse_log_json(log_url: str, reader) -> Dict:
+    builder = ijson.ObjectBuilder()
+    kept = {}
+    async for prefix, event, value in ijson.parse_async(reader, use_float=True):
+        # Map keys belong to the prefix of the map, check the prefix of the value instead
+        path = (f"{prefix}.{value}" if prefix else value) if event == "map_key" else prefix
+        if path not in kept:
+            kept[path] = is_kept(path)
+        if kept[path]:
+            builder.event(event, value)
+    return builder.value
+
+
+async def get_log_json(log_url: str) -> Dict:
+    # Logs don't change, reuse a previously downloaded log
+    log_json = await get_cached_log(log_url)
+    if log_json is not None:
+        return log_json
+
+    async with download_semaphore:
+        # The same log might have been downloaded while waiting
+        log_json = await get_cached_log(log_url)
+        if log_json is not None:
+            return log_json
+
+        download_stats["active"] += 1
+        try:
+            log_json = await download_log_json(log_url)
+        finally:
+            download_stats["active"] -= 1
+        download_stats["downloaded"] += 1
+        await cache_log(log_url, log_json)
+    return log_json
+
+
+async def download_log_json(log_url: str) -> Dict:
+    # Get json data from dps.report
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{DPS_REPORT_URL}/getJson?permalink=" + log_url) as r:
+            if r.status != 200:
+                raise LogException(log_url, f"{r.status}: {await r.text()}")
+            if r.content_length and r.content_length > MAX_LOG_SIZE:
+                raise LogException(log_url, f"Log is larger than {MAX_LOG_SIZE // (1024 * 1024)} MB")
+            try:
+                return await parse_log_json(log_url, BoundedReader(log_url, r.content))
+            except LogException:
+                raise
+            except Exception as e:
+                raise LogException(log_url, str(e))
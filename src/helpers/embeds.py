@@ -1,13 +1,20 @@
-from typing import Dict
+import os
+import time
+from typing import Dict, List, Tuple
 import discord
 from discord import Embed
-from sqlalchemy import select, desc
+from sqlalchemy import Row, select, desc
 from sqlalchemy.ext.asyncio import AsyncSession
-from exceptions import APIException
+from exceptions import APIException, LogException
 from models.enums.log_status import LogStatus
 from models.enums.role import Role
 from models.log import Log
 
+PROGRESS_CACHE_SECONDS = int(os.getenv("PROGRESS_CACHE_SECONDS", "60"))
+
+# Progress rows of a user with the time they were loaded
+progress_cache: Dict[int, Tuple[float, List[Row]]] = {}
+
 
 # Splits log text into multiple embed fields under one title
 def split_embed(embed: Embed, title: str, text: str, inline: bool = False) -> Embed:
@@ -27,27 +34,53 @@ def split_embed(embed: Embed, title: str, text: str, inline: bool = False) -> Em
     return embed
 
 
-def generate_error_embed(error: Exception):
-    embed = Embed(title="Error", colour=discord.Colour.red())
+def get_error_message(error: Exception) -> str:
     if isinstance(error, APIException):
-        embed.description = f"**An error occurred while trying to access the Guild Wars 2 API:**\n" \
-                            f"{error.error_message}"
-    else:
-        embed.description = "An unknown error occurred. Please try again later."
-    return embed
+        return f"**An error occurred while trying to access the Guild Wars 2 API:**\n" \
+               f"{error.error_message}"
+    if isinstance(error, LogException):
+        return f"**An error occurred while trying to download the log:**\n" \
+               f"{error.error_message}"
+    return "An unknown error occurred. Please try again later."
+
+
+def generate_error_embed(error: Exception):
+    return Embed(title="Error", colour=discord.Colour.red(), description=get_error_message(error))
+
+
+async def get_progress(session: AsyncSession, discord_user_id: int) -> List[Row]:
+    now = time.monotonic()
+    cached = progress_cache.get(discord_user_id)
+    if cached and now - cached[0] < PROGRESS_CACHE_SECONDS:
+        return cached[1]
+
+    stmt = select(Log.tier, Log.role, Log.fight_name, Log.log_url, Log.status).where(Log.discord_user_id == discord_user_id)\
+        .where(Log.status != LogStatus.DENIED).order_by(desc(Log.status))
+    progress = (await session.execute(stmt)).all()
+
+    # Drop expired entries so the cache doesn't grow with every user that ever checked their progress
+    for user_id in [user_id for user_id, (created, _) in progress_cache.items() if now - created >= PROGRESS_CACHE_SECONDS]:
+        del progress_cache[user_id]
+    progress_cache[discord_user_id] = (now, progress)
+    return progress
+
+
+def invalidate_progress(discord_user_id: int) -> None:
+    # Has to be called after the logs of a user changed
+    progress_cache.pop(discord_user_id, None)
 
 
 async def get_progress_embed(session: AsyncSession, discord_user: discord.User) -> Embed:
     embed = discord.Embed(title="Tier Progress", color=discord.Color.green())
     embed.set_author(name=discord_user.display_name, icon_url=discord_user.avatar)
-    stmt = select(Log).where(Log.discord_user_id == discord_user.id).where(Log.status != LogStatus.DENIED).order_by(desc(Log.status))
+    progress = await get_progress(session, discord_user.id)
 
     # Tier 2
-    logs = (await session.execute(stmt.where(Log.tier == 2))).scalars().all()
-
     value = ""
     accepted = 0
-    for log in logs:
+    for log in progress:
+        if log.tier != 2:
+            continue
         value += f"[{log.fight_name}]({log.log_url}): {log.status}\n"
         accepted += 1 if log.status == LogStatus.REVIEW_ACCEPTED else 0
     embed.add_field(name=f"Tier 2:", value=f"Progress: {accepted}/2\n" + value, inline=False)
@@ -56,10 +89,11 @@ async def get_progress_embed(session: AsyncSession, discord_user: discord.User)
     for role in Role:
         if role == Role.NONE:
             continue
-        logs = (await session.execute(stmt.where(Log.tier == 3).where(Log.role == role))).scalars().all()
         value = ""
         accepted = 0
-        for log in logs:
+        for log in progress:
+            if log.tier != 3 or log.role != role:
+                continue
             value += f"[{log.fight_name}]({log.log_url}): {log.status}\n"
             accepted += 1 if log.status == LogStatus.REVIEW_ACCEPTED else 0
         embed.add_field(name=f"Tier 3: {role.value}", value=f"Progress: {accepted}/3\n" + value, inline=False)
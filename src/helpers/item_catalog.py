@@ -0,0 +1,71 @@
+import datetime
+import os
+import traceback
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from database import Session
+from models.build import Build
+from models.catalog import CatalogItem, CatalogItemStats
+
+CATALOG_REFRESH_HOURS = int(os.getenv("CATALOG_REFRESH_HOURS", "24"))
+
+CATALOGS = {
+    "items": CatalogItem,
+    "itemstats": CatalogItemStats,
+}
+
+
+async def read_catalog(endpoint: str, ids: Iterable[int]) -> Dict[int, dict]:
+    async with Session() as session:
+        return await CATALOGS[endpoint].get_many(session, ids)
+
+
+async def write_catalog(endpoint: str, entries: Iterable[dict]) -> Dict[int, dict]:
+    catalog = CATALOGS[endpoint]
+    entries = list(entries)
+    try:
+        async with Session.begin() as session:
+            return await catalog.store(session, entries)
+    except IntegrityError:
+        # Another request stored the same entries at the same time, the catalogue is only a cache
+        traceback.print_exc()
+        return {entry["id"]: catalog.compact(entry) for entry in entries}
+
+
+async def get_missing_ids(endpoint: str, ids: Iterable[int]) -> set:
+    # Returns the ids that are not in the catalogue
+    ids = set(ids)
+    return ids - (await read_catalog(endpoint, ids)).keys()
+
+
+async def get_stale_ids(endpoint: str) -> set:
+    # Returns the ids of all entries that were not checked recently, also the ones that came in through a gear check
+    catalog = CATALOGS[endpoint]
+    checked_before = datetime.datetime.utcnow() - datetime.timedelta(hours=CATALOG_REFRESH_HOURS)
+    async with Session() as session:
+        return set((await session.execute(select(catalog.id).where(catalog.checked_at < checked_before))).scalars().all())
+
+
+async def refresh_catalog(api) -> Tuple[int, int]:
+    # Items used by the current builds
+    async with Session() as session:
+        stmt = select(Build).where(Build.archived == False).options(selectinload(Build.equipment))
+        builds = (await session.execute(stmt)).scalars().all()
+        item_ids = {item.item_id for build in builds if build.equipment for item in build.equipment.items}
+
+    # Preload missing build items and refresh every item that was not checked recently
+    fetch_ids = await get_missing_ids("items", item_ids) | await get_stale_ids("items")
+    items = await write_catalog("items", (await api.fetch_bulk("items", fetch_ids)).values())
+
+    # Stats of all build items, also of the ones that are still fresh
+    stats_ids = set()
+    for item in (await read_catalog("items", item_ids - items.keys()) | items).values():
+        details = item["details"]
+        if "infix_upgrade" in details:
+            stats_ids.add(details["infix_upgrade"]["id"])
+        stats_ids.update(details.get("stat_choices", []))
+    fetch_ids = await get_missing_ids("itemstats", stats_ids) | await get_stale_ids("itemstats")
+    stats = await write_catalog("itemstats", (await api.fetch_bulk("itemstats", fetch_ids)).values())
+    return len(items), len(stats)
@@ -0,0 +1,92 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Dict
+
+LOG_CACHE_DIR = os.getenv("LOG_CACHE_DIR", "log-cache")
+LOG_CACHE_MAX_SIZE = int(os.getenv("LOG_CACHE_MAX_MB", "500")) * 1024 * 1024
+LOG_CACHE_TTL = int(os.getenv("LOG_CACHE_TTL_HOURS", "168")) * 60 * 60
+
+
+def get_cache_path(log_url: str) -> str:
+    # Permalinks are case-sensitive, only strip the parts that don't identify the log
+    permalink = log_url.strip().rstrip("/").split("?")[0].split("#")[0]
+    permalink = permalink.rsplit("/", 1)[-1]
+    return os.path.join(LOG_CACHE_DIR, hashlib.sha256(permalink.encode()).hexdigest() + ".json.gz")
+
+
+def read_cached_log(log_url: str) -> Dict | None:
+    path = get_cache_path(log_url)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    # mtime is the time the log was cached
+    if time.time() - stat.st_mtime > LOG_CACHE_TTL:
+        remove_file(path)
+        return None
+
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            log_json = json.load(f)
+    except (OSError, ValueError):
+        remove_file(path)
+        return None
+
+    # atime is the time the log was last used, used for LRU eviction
+    os.utime(path, (time.time(), stat.st_mtime))
+    return log_json
+
+
+def write_cached_log(log_url: str, log_json: Dict) -> None:
+    os.makedirs(LOG_CACHE_DIR, exist_ok=True)
+    path = get_cache_path(log_url)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(log_json, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    evict()
+
+
+def evict() -> None:
+    entries = []
+    now = time.time()
+    for entry in os.scandir(LOG_CACHE_DIR):
+        if not entry.name.endswith(".json.gz"):
+            continue
+        stat = entry.stat()
+        if now - stat.st_mtime > LOG_CACHE_TTL:
+            remove_file(entry.path)
+            continue
+        entries.append((stat.st_atime, stat.st_size, entry.path))
+
+    # Remove least recently used logs until the cache fits
+    size = sum(entry[1] for entry in entries)
+    for atime, file_size, path in sorted(entries):
+        if size <= LOG_CACHE_MAX_SIZE:
+            break
+        remove_file(path)
+        size -= file_size
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def get_cached_log(log_url: str) -> Dict | None:
+    return await asyncio.to_thread(read_cached_log, log_url)
+
+
+async def cache_log(log_url: str, log_json: Dict) -> None:
+    try:
+        await asyncio.to_thread(write_cached_log, log_url, log_json)
+    except OSError as e:
+        # The cache is optional, don't fail the log check
+        print(f"Could not cache log {log_url}: {e}")
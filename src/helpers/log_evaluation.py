@@ -0,0 +1,178 @@
+from typing import Dict, NamedTuple
+from helpers.log_summary import LogSummary, PlayerSummary
+from helpers.rules import EncounterRules
+from models.enums.mech_mode import MechMode
+from models.enums.pools import BossLogPool
+from models.feedback import FeedbackGroup, FeedbackLevel, Feedback, FeedbackCollection
+
+# Everything in here runs in the process pool. It must not use the database, the config cache or the rule index,
+# the values it needs are passed in as arguments
+
+
+class LogLimits(NamedTuple):
+    min_gw2_build: int
+    max_player_downs: int
+    max_squad_downs: int
+    max_squad_deaths: int
+
+
+class SubmissionHistory(NamedTuple):
+    # Previously submitted logs of the user
+    same_log: bool
+    same_boss: bool
+    # Logs per boss pool of the tier, including the submitted log
+    boss_pools: Dict[BossLogPool, int]
+
+
+def evaluate_log(log_json: Dict, account_name: str, tier: int, history: SubmissionHistory, rules: EncounterRules,
+                 limits: LogLimits) -> FeedbackCollection:
+    fbc = FeedbackCollection()
+
+    # General log checks
+    fbg_valid = FeedbackGroup(message="Checking if log is valid")
+    fbc.add(fbg_valid)
+
+    summary = LogSummary(log_json)
+    player = summary.get_player(account_name)
+    if not player:
+        fbg_valid.add(Feedback(f"Could not find account {account_name} in log", FeedbackLevel.ERROR))
+
+    # Check version
+    if summary.gw2_build < limits.min_gw2_build:
+        fbg_valid.add(Feedback(f"Log is from before the latest major balance patch.", FeedbackLevel.ERROR))
+
+    # Check if this exact log was already submitted
+    if history.same_log:
+        fbg_valid.add(Feedback(f"You already submitted this log.", FeedbackLevel.ERROR))
+
+    # Check if a log for this boss was already submitted
+    if history.same_boss:
+        fbg_valid.add(Feedback(f"You already submitted a log for this boss.", FeedbackLevel.ERROR))
+
+    # Check boss pool
+    if history.boss_pools[BossLogPool.NOT_ALLOWED]:
+        fbg_valid.add(Feedback(f"You submitted a log from a boss that is {BossLogPool.NOT_ALLOWED.value}", FeedbackLevel.ERROR))
+
+    if tier == 2:
+        if history.boss_pools[BossLogPool.POOL_1] > 1:
+            fbg_valid.add(Feedback(f"You can only submit one log from pool {BossLogPool.POOL_1.value}", FeedbackLevel.ERROR))
+    elif tier == 3:
+        if history.boss_pools[BossLogPool.POOL_1] > 0 or history.boss_pools[BossLogPool.POOL_2] > 0:
+            fbg_valid.add(Feedback(f"You can only submit logs from pool {BossLogPool.POOL_3.value} and {BossLogPool.POOL_4.value}", FeedbackLevel.ERROR))
+        if history.boss_pools[BossLogPool.POOL_3] > 2:
+            fbg_valid.add(Feedback(f"At least one log must be from pool {BossLogPool.POOL_4.value}", FeedbackLevel.ERROR))
+
+    # Don't need to check performance if the log is invalid
+    if fbg_valid.level == FeedbackLevel.ERROR:
+        return fbc
+
+    # General performance checks
+    fbg_general = FeedbackGroup(message="Checking performance")
+    fbc.add(fbg_general)
+
+    if not summary.success:
+        fbg_general.add(Feedback("Boss was not killed", FeedbackLevel.ERROR))
+
+    if player.dead_count > 0:
+        fbg_general.add(Feedback(f"You've died. You must be alive at the end of the fight.", FeedbackLevel.ERROR))
+
+    if player.down_count > limits.max_player_downs:
+        fbg_general.add(Feedback(f"You have downed more than {limits.max_player_downs} times. ({player.down_count})", FeedbackLevel.ERROR))
+
+    check_food(player, fbg_general)
+
+    if summary.squad_downs > limits.max_squad_downs:
+        fbg_general.add(Feedback(f"Your squad downed more than {limits.max_squad_downs} times. ({summary.squad_downs})", FeedbackLevel.ERROR))
+
+    if summary.squad_deaths > limits.max_squad_deaths:
+        fbg_general.add(Feedback(f"Your squad has more than {limits.max_squad_deaths} deaths. ({summary.squad_deaths})", FeedbackLevel.ERROR))
+
+    # Blood Magic
+    if 29726 in summary.squad_buffs:
+        fbg_general.add(Feedback(f"We do not allow logs with a Blood Magic Necromancer present.", FeedbackLevel.ERROR))
+
+    # Emboldened
+    if 68087 in summary.squad_buffs:
+        fbg_general.add(Feedback(f"We do not allow logs with Emboldened Mode active.", FeedbackLevel.ERROR))
+
+    check_healers(summary, fbg_general)
+
+    # Check mechanics
+    fbg_mech = FeedbackGroup(message=f"Checking mechanics")
+    fbc.add(fbg_mech)
+    check_mechanics(summary, account_name, rules, fbg_mech)
+
+    return fbc
+
+def check_food(player: PlayerSummary, fbg: FeedbackGroup):
+    # no consumables at all
+    if not player.consumables:
+        fbg.add(Feedback("Did not use food and/or utility.", FeedbackLevel.ERROR))
+        return fbg
+
+    # get used consumable ids, don't add Reinforced Armour (ID: 9283)
+    consumable_ids = {c['id'] for c in player.consumables if c['id'] != 9283}
+
+    # Diminished
+    if 46668 in consumable_ids and 46668 in player.buffs and player.buffs[46668][0]['uptime'] >= 25:
+        fbg.add(Feedback("Did not refresh utility.", FeedbackLevel.ERROR))
+    # Malnourished
+    if 46587 in consumable_ids and 46587 in player.buffs and player.buffs[46587][0]['uptime'] >= 25:
+        fbg.add(Feedback("Did not refresh food.", FeedbackLevel.ERROR))
+
+    # check if started fight with food and consumables or had consumable activity in the first ten seconds
+    tmp_consumable_counter = 0
+    for c in player.consumables:
+        if c['time'] < 10000 and c['id'] != 46587 and c['id'] != 46668:
+            tmp_consumable_counter += 1
+
+    if tmp_consumable_counter < 2:
+        fbg.add(Feedback("Did not start the fight with food and/or utility.", FeedbackLevel.ERROR))
+
+def check_healers(summary: LogSummary, fbg: FeedbackGroup) -> None:
+    amount_of_healers = 0
+
+    for player in summary.player_list:
+        # Ether Signet on a Chronomancer -> not a healer
+        if player.healing == 10 and not (player.profession == "Chronomancer" and player.has_buff(21751)):
+            amount_of_healers += 1
+
+    # HK counts as healer at deimos
+    if (int(summary.encounter_id) == 132100 and amount_of_healers <= 3) or amount_of_healers <= 2:
+        return
+    fbg.add(Feedback("Potentially too many healers.", FeedbackLevel.WARNING))
+
+
+def check_mechanics(summary: LogSummary, account_name: str, rules: EncounterRules, fbg_mech: FeedbackGroup,
+                    mech_id: int = None, debug: bool = False) -> None:
+    mechs = rules.mechs
+    if mech_id:
+        mechs = {name: tuple(mech for mech in name_mechs if mech.id == mech_id) for name, name_mechs in mechs.items()}
+
+    # Get character name
+    player = summary.get_player(account_name)
+    if not player:
+        raise Exception(f"Could not find character name for account {account_name}")
+
+    # Check mechanics
+    for mech in sorted((mech for name_mechs in mechs.values() for mech in name_mechs), key=lambda m: m.id):
+        mechanic = summary.mechanics.get(mech.name)
+        full_name = mechanic.full_name if mechanic else None
+        amount = 0
+        if mechanic:
+            amount = mechanic.actors[player.name] if mech.mode == MechMode.PLAYER else mechanic.total
+
+        if debug and full_name:
+            fbg_mech.add(Feedback(f"Found {amount} {full_name} ({mech.name}) ({mech.max_amount} allowed)",
+                                  FeedbackLevel.ERROR if amount > mech.max_amount else FeedbackLevel.SUCCESS))
+            continue
+        if debug and not full_name:
+            fbg_mech.add(Feedback(f"Could not find {mech.name} in log. "
+                                  f"Either the mech name is wrong or no one got hit by the mechanic. "
+                                  f"You can manually check the log to verify if the check is working correctly.",
+                                  FeedbackLevel.WARNING))
+            continue
+
+        if amount > mech.max_amount:
+            fbg_mech.add(Feedback(f"{'You' if mech.mode == MechMode.PLAYER else 'Your squad'} failed {full_name}"
+                                  f" {amount} time{'s' if amount > 1 else ''}. ({mech.max_amount} allowed)", FeedbackLevel.ERROR))
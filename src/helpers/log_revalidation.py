@@ -0,0 +1,88 @@
+import asyncio
+import traceback
+from collections import Counter
+from typing import Awaitable, Callable, List, Tuple
+import discord
+from discord.ext import commands
+from sqlalchemy import select, update
+from database import Session
+from helpers.dps_report import get_log_json
+from helpers.embeds import get_log_embed, invalidate_progress
+from helpers.log_checks import check_log
+from models.config import Config
+from models.enums.config_key import ConfigKey
+from models.enums.log_status import LogStatus
+from models.feedback import FeedbackLevel
+from models.log import Log
+
+PASSED = "passed"
+DENIED = "denied"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+async def revalidate_log(bot: commands.Bot, log: Log, reviewer_id: int) -> str:
+    # Logs from before the account name was stored can't be checked again, the account can't be recovered from the log
+    if not log.account_name:
+        return SKIPPED
+
+    # Same checks as a new submission, the log itself is not a duplicate
+    log_json = await get_log_json(log.log_url)
+    fbc = await check_log(log_json, log.account_name, log.tier, log.discord_user_id, log.log_url, log, exclude_log_id=log.id)
+    if fbc.level != FeedbackLevel.ERROR:
+        return PASSED
+
+    # Only deny logs that haven't been reviewed in the meantime
+    async with Session.begin() as session:
+        stmt = update(Log).where(Log.id == log.id).where(Log.status == LogStatus.WAITING_FOR_REVIEW)\
+            .values(status=LogStatus.DENIED, reviewer=reviewer_id, review_message_id=None)
+        if (await session.execute(stmt)).rowcount == 0:
+            return SKIPPED
+    invalidate_progress(log.discord_user_id)
+
+    # Replace the review message with the new feedback and remove the buttons
+    if log.review_message_id:
+        user = bot.get_user(log.discord_user_id) or await bot.fetch_user(log.discord_user_id)
+        embed = get_log_embed(log.log_url, log_json, user, log.account_name, log.role, log.tier)
+        embed.title = f"Automatically denied: {embed.title}"
+        embed.colour = LogStatus.DENIED.colour
+        fbc.to_embed(embed)
+        channel = bot.get_channel(Config.get_int(ConfigKey.LOG_REVIEW_CHANNEL_ID))
+        try:
+            await channel.get_partial_message(log.review_message_id).edit(embed=embed, view=None)
+        except discord.HTTPException:
+            traceback.print_exc()
+    return DENIED
+
+
+async def revalidate_pending_logs(bot: commands.Bot, reviewer_id: int, concurrency: int,
+                                  on_progress: Callable[[int, int], Awaitable[None]] = None) -> Tuple[Counter, List[Log]]:
+    # Checks all logs that are waiting for a review again, returns the result counts and the denied logs
+    async with Session() as session:
+        stmt = select(Log).where(Log.status == LogStatus.WAITING_FOR_REVIEW).order_by(Log.id)
+        logs = (await session.execute(stmt)).scalars().all()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results = Counter()
+    denied = []
+
+    async def run(log: Log):
+        async with semaphore:
+            try:
+                result = await revalidate_log(bot, log, reviewer_id)
+            except Exception:
+                print(f"Error checking log {log.id} again:")
+                traceback.print_exc()
+                result = FAILED
+        results[result] += 1
+        if result == DENIED:
+            denied.append(log)
+        if on_progress:
+            # A failed progress update must not stop the other checks
+            try:
+                await on_progress(sum(results.values()), len(logs))
+            except Exception:
+                traceback.print_exc()
+
+    await asyncio.gather(*[run(log) for log in logs])
+    return results, denied
@@ -0,0 +1,65 @@
+from collections import Counter
+from typing import Dict, List, Set
+
+
+class PlayerSummary:
+    def __init__(self, player: Dict):
+        self.account = player["account"]
+        self.name = player["name"]
+        self.profession = player["profession"]
+        self.healing = player["healing"]
+        self.down_count = player["defenses"][0]["downCount"]
+        self.dead_count = player["defenses"][0]["deadCount"]
+        self.consumables = player.get("consumables", [])
+        # buff id -> buffData
+        self.buffs = {buff["id"]: buff["buffData"] for buff in player.get("buffUptimes", [])}
+
+    def has_buff(self, buff_id: int) -> bool:
+        return buff_id in self.buffs
+
+
+class MechanicSummary:
+    def __init__(self, name: str, full_name: str):
+        self.name = name
+        self.full_name = full_name
+        self.total = 0
+        # actor name -> amount
+        self.actors = Counter()
+
+    def add(self, mechanics_data: List[Dict]):
+        self.total += len(mechanics_data)
+        self.actors.update(mechanic_data["actor"] for mechanic_data in mechanics_data)
+
+
+class LogSummary:
+    def __init__(self, log_json: Dict):
+        self.encounter_id = log_json["eiEncounterID"]
+        self.is_cm = log_json["isCM"]
+        self.gw2_build = log_json["gW2Build"]
+        self.success = log_json["success"]
+
+        # Walk all players once
+        self.players: Dict[str, PlayerSummary] = {}
+        self.player_list: List[PlayerSummary] = []
+        self.squad_downs = 0
+        self.squad_deaths = 0
+        self.squad_buffs: Set[int] = set()
+        for player in log_json["players"]:
+            summary = PlayerSummary(player)
+            self.player_list.append(summary)
+            # keep the first entry like the old lookups did
+            self.players.setdefault(summary.account, summary)
+            self.squad_downs += summary.down_count
+            self.squad_deaths += summary.dead_count
+            self.squad_buffs.update(summary.buffs)
+
+        # Walk all mechanics once
+        self.mechanics: Dict[str, MechanicSummary] = {}
+        for mechanic in log_json.get("mechanics", []):
+            name = mechanic["name"]
+            if name not in self.mechanics:
+                self.mechanics[name] = MechanicSummary(name, mechanic.get("fullName", name))
+            self.mechanics[name].add(mechanic["mechanicsData"])
+
+    def get_player(self, account_name: str) -> PlayerSummary | None:
+        return self.players.get(account_name)
@@ -0,0 +1,35 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# 0 runs the work in a thread instead of a separate process
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "2"))
+
+executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if not executor:
+        # spawn doesn't copy the event loop and open connections of the bot into the workers
+        executor = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return executor
+
+
+async def run_in_process(func: Callable[..., T], *args) -> T:
+    # func and args have to be picklable
+    if PROCESS_POOL_WORKERS <= 0:
+        return await asyncio.to_thread(func, *args)
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), functools.partial(func, *args))
+
+
+def shutdown_pool() -> None:
+    global executor
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -0,0 +1,82 @@
+from typing import ClassVar, Dict, Iterable, NamedTuple, Tuple
+from sqlalchemy import select
+from database import Session
+from models.boss import Boss
+from models.enums.mech_mode import MechMode
+from models.enums.pools import BossLogPool, KillProofPool
+from models.mech import Mech
+
+
+class BossRule(NamedTuple):
+    encounter_id: int
+    is_cm: bool
+    boss_name: str
+    kp_pool: KillProofPool
+    log_pool: BossLogPool
+    achievement_id: int | None
+
+    @property
+    def full_name(self):
+        return f"{self.boss_name} CM" if self.is_cm else f"{self.boss_name}"
+
+
+class MechRule(NamedTuple):
+    id: int
+    encounter_id: int
+    name: str
+    max_amount: int
+    mode: MechMode
+
+
+class EncounterRules(NamedTuple):
+    boss: BossRule | None
+    # Mechanic name -> mech checks for that mechanic
+    mechs: Dict[str, Tuple[MechRule, ...]]
+
+    @property
+    def log_pool(self) -> BossLogPool:
+        return self.boss.log_pool if self.boss else BossLogPool.NOT_ALLOWED
+
+    @property
+    def mech_list(self) -> Tuple[MechRule, ...]:
+        return tuple(sorted((mech for mechs in self.mechs.values() for mech in mechs), key=lambda mech: mech.id))
+
+
+class RuleIndex:
+    # The index is never modified. Changes to the bosses or mechs replace RuleIndex.current as a whole
+    current: ClassVar["RuleIndex"]
+
+    def __init__(self, bosses: Iterable[Boss], mechs: Iterable[Mech]):
+        self.bosses: Tuple[BossRule, ...] = tuple(
+            BossRule(boss.encounter_id, boss.is_cm, boss.boss_name, boss.kp_pool, boss.log_pool, boss.achievement_id)
+            for boss in bosses)
+
+        # Mech checks apply to both the normal and the CM version of an encounter
+        mechs_by_encounter: Dict[int, Dict[str, Tuple[MechRule, ...]]] = {}
+        for mech in sorted(mechs, key=lambda m: m.id):
+            encounter_mechs = mechs_by_encounter.setdefault(mech.encounter_id, {})
+            rule = MechRule(mech.id, mech.encounter_id, mech.name, mech.max_amount, mech.mode)
+            encounter_mechs[mech.name] = encounter_mechs.get(mech.name, ()) + (rule,)
+
+        bosses_by_key = {(boss.encounter_id, boss.is_cm): boss for boss in self.bosses}
+        self.encounters: Dict[Tuple[int, bool], EncounterRules] = {}
+        for encounter_id in {boss.encounter_id for boss in self.bosses} | mechs_by_encounter.keys():
+            for is_cm in (False, True):
+                boss = bosses_by_key.get((encounter_id, is_cm))
+                # If the log is a CM, but we don't have a CM boss, use the non-CM boss
+                if not boss and is_cm:
+                    boss = bosses_by_key.get((encounter_id, False))
+                self.encounters[(encounter_id, is_cm)] = EncounterRules(boss, mechs_by_encounter.get(encounter_id, {}))
+
+    def get(self, encounter_id: int, is_cm: bool) -> EncounterRules:
+        return self.encounters.get((int(encounter_id), bool(is_cm)), EncounterRules(None, {}))
+
+    @staticmethod
+    async def reload() -> None:
+        async with Session() as session:
+            bosses = await Boss.all(session)
+            mechs = (await session.execute(select(Mech))).scalars().all()
+            RuleIndex.current = RuleIndex(bosses, mechs)
+
+
+RuleIndex.current = RuleIndex((), ())
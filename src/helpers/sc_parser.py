@@ -0,0 +1,56 @@
+import importlib.util
+import os
+from typing import Dict, List
+from bs4 import BeautifulSoup
+from soupsieve.util import lower
+
+# Use lxml when it is installed, it is a lot faster than the builtin parser
+HTML_PARSER = os.getenv("SC_HTML_PARSER") or ("lxml" if importlib.util.find_spec("lxml") else "html.parser")
+SNOWCROWS_URL = os.getenv("SNOWCROWS_URL", "https://snowcrows.com").rstrip("/")
+
+
+def parse_build_page(url: str, html: bytes) -> Dict:
+    # Extract everything needed from the build page without touching the API
+    sc_soup = BeautifulSoup(html.decode("utf-8"), HTML_PARSER)
+    table_data = sc_soup.find_all("td")
+    page = {
+        "url": url,
+        "name": f"{sc_soup.find_all('h1')[0].text}",
+        "profession": sc_soup.find_all("i", {"class": "fa-solid fa-shuffle mr-2"})[0].parent.text.strip().split(' ')[0].strip(),
+        "entries": [],
+    }
+    for i in range(0, len(table_data), 2):
+        div = table_data[i].div
+
+        # Check if slot has item
+        if not div["data-armory-ids"]:
+            continue
+
+        item_id = int(div["data-armory-ids"])
+        stats_id = div.get(f"data-armory-{item_id}-stat")
+        upgrade_ids = div.get(f"data-armory-{item_id}-upgrades", "").split(",")
+        label = table_data[i + 1].p.span
+        label = label.text if label else None
+        # Infusions are listed with their amount instead of a slot (e.g. "18x"), checked when the build is created
+        amount = label.replace("x", "") if label else ""
+        page["entries"].append({
+            "item_id": item_id,
+            "stats_id": int(stats_id) if stats_id and stats_id.isdecimal() else None,
+            "upgrade_ids": [int(upgrade_id) for upgrade_id in upgrade_ids if upgrade_id.isdecimal()],
+            "label": label,
+            "amount": int(amount) if amount.isdecimal() else None,
+            "div": str(div),
+        })
+    return page
+
+
+def parse_build_list(profession_name: str, category: str, html: bytes) -> List[str]:
+    # Find all builds of the category that are not kite builds or beginner builds
+    links = []
+    sc_soup = BeautifulSoup(html.decode("utf-8"), HTML_PARSER)
+    for link in sc_soup.find_all("a", href=True):
+        if (link["href"].startswith(f"/builds/raids/{lower(profession_name)}")
+                and "kite" not in link["href"] and link["href"].count("/") > 3
+                and category.lower() in link.find("div", {"class": "text-xs"}).text.lower()):
+            links.append(SNOWCROWS_URL + link["href"])
+    return links
@@ -1,43 +1,48 @@
 import os
 import discord
 from discord.ext import commands
-from sqlalchemy import select
+from api import API
 from cogs.admin_commands import AdminCommands
+from cogs.catalog_tasks import CatalogTasks
+from cogs.log_queue import LogQueue
 from cogs.mech_commands import MechCommands
-from models.application import Application
-from models.enums.application_status import ApplicationStatus
-from models.enums.log_status import LogStatus
-from models.log import Log
+from cogs.review_interactions import ReviewInteractions
+from helpers.process_pool import shutdown_pool
+from helpers.rules import RuleIndex
+from models.config import Config
 from views.application_overview import ApplicationOverview
 from database import init_db, Session
-from views.log_review import LogReviewView
-from views.review import ReviewView
+from migrations import migrate_db
 
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-bot = commands.Bot(command_prefix="!", intents=intents)
 
+class Bot(commands.Bot):
+    async def setup_hook(self):
+        # Runs once before connecting, on_ready runs again after every reconnect
+        API.open_session()
+        await init_db()
+        await migrate_db()
+        async with Session() as session:
+            await Config.load(session)
+        await RuleIndex.reload()
+        await self.add_cog(AdminCommands(self))
+        await self.add_cog(MechCommands(self))
+        await self.add_cog(CatalogTasks(self))
+        await self.add_cog(LogQueue(self))
+        await self.add_cog(ReviewInteractions(self))
+        self.add_view(ApplicationOverview(self))
 
-@bot.event
-async def setup_hook():
-    bot.add_view(ApplicationOverview(bot))
+    async def close(self):
+        await super().close()
+        await API.close_session()
+        shutdown_pool()
 
 
-@bot.event
-async def on_ready():
-    await bot.add_cog(AdminCommands(bot))
-    await bot.add_cog(MechCommands(bot))
-    await init_db()
-    async with Session.begin() as session:
-        stmt = select(Application).where(Application.status == ApplicationStatus.WAITING_FOR_REVIEW)
-        applications = (await session.execute(stmt)).scalars()
-        for application in applications:
-            bot.add_view(ReviewView(bot, application.id))
+intents = discord.Intents.default()
+intents.members = True
+intents.message_content = True
+bot = Bot(command_prefix="!", intents=intents)
 
-        stmt = select(Log).where(Log.status == LogStatus.WAITING_FOR_REVIEW)
-        logs = (await session.execute(stmt)).scalars()
-        for log in logs:
-            bot.add_view(LogReviewView(bot, log.id))
 
-bot.run(os.getenv("DISCORD_TOKEN"))
\ No newline at end of file
+# Worker processes import this module as well, only the main process runs the bot
+if __name__ == "__main__":
+    bot.run(os.getenv("DISCORD_TOKEN"))
\ No newline at end of file
@@ -0,0 +1,54 @@
+from sqlalchemy import inspect, select, text
+from sqlalchemy.orm import selectinload
+from database import engine, Session
+from models.application import Application
+from models.enums.equipment_slot import EquipmentSlot
+from models.equipment import Equipment
+from models.log import Log
+
+
+async def migrate_db():
+    await add_missing_columns()
+    await add_missing_indexes()
+    await pack_legacy_equipment()
+
+
+async def add_missing_columns():
+    # create_all only creates missing tables, new columns of existing tables have to be added here
+    async with engine.begin() as conn:
+        for table, column in [(Equipment.__table__, Equipment.__table__.c.data), (Log.__table__, Log.__table__.c.account_name)]:
+            columns = await conn.run_sync(lambda sync_conn: [c["name"] for c in inspect(sync_conn).get_columns(table.name)])
+            if column.name not in columns:
+                print(f"Adding column {table.name}.{column.name}")
+                column_type = column.type.compile(dialect=conn.dialect)
+                await conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+
+async def add_missing_indexes():
+    # create_all only creates the indexes of new tables
+    async with engine.begin() as conn:
+        for table in [Log.__table__, Application.__table__]:
+            for index in table.indexes:
+                await conn.run_sync(lambda sync_conn: index.create(sync_conn, checkfirst=True))
+
+
+async def pack_legacy_equipment(batch_size: int = 500):
+    # Move equipment stored as one row per item into the data column
+    legacy_options = [selectinload(getattr(Equipment, f"legacy_{slot.value}")) for slot in EquipmentSlot]
+    legacy_options.append(selectinload(Equipment.legacy_stats))
+    migrated = 0
+    while True:
+        async with Session.begin() as session:
+            stmt = select(Equipment).where(Equipment.data.is_(None)).options(*legacy_options).limit(batch_size)
+            equipments = (await session.execute(stmt)).scalars().all()
+            if not equipments:
+                break
+            for equipment in equipments:
+                equipment.data = {
+                    "items": {slot.name: getattr(equipment, f"legacy_{slot.value}").to_data()
+                              for slot in EquipmentSlot if getattr(equipment, f"legacy_{slot.value}")},
+                    "stats": equipment.legacy_stats.to_data() if equipment.legacy_stats else None,
+                }
+            migrated += len(equipments)
+    if migrated:
+        print(f"Migrated {migrated} equipment rows to the data column")
@@ -1,5 +1,5 @@
 import datetime
-from sqlalchemy import ForeignKey, DateTime, func, BigInteger
+from sqlalchemy import ForeignKey, DateTime, func, BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from models.base import Base
 from models.enums.application_status import ApplicationStatus
@@ -7,6 +7,12 @@ from models.enums.application_status import ApplicationStatus
 
 class Application(Base):
     __tablename__ = "applications"
+    __table_args__ = (
+        # Open application of a user
+        Index("ix_applications_user_status", "discord_user_id", "status"),
+        # Pending reviews on startup and the stats command
+        Index("ix_applications_status", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     discord_user_id: Mapped[int] = mapped_column(BigInteger)
@@ -17,9 +23,10 @@ class Application(Base):
     account_name: Mapped[str]
     character_name: Mapped[str]
     equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=True)
-    equipment = relationship("Equipment", foreign_keys=[equipment_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    # Queries that need the equipment or build have to load them explicitly (selectinload/joinedload)
+    equipment = relationship("Equipment", foreign_keys=[equipment_id], lazy="raise", single_parent=True, cascade="all, delete, delete-orphan")
     build_id = mapped_column(ForeignKey("builds.id"))
-    build = relationship("Build", foreign_keys=[build_id], lazy="joined")
+    build = relationship("Build", foreign_keys=[build_id], lazy="raise")
 
     def __init__(self):
         super(Application, self).__init__()
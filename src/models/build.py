@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Iterable, Optional
 from sqlalchemy import ForeignKey, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
@@ -15,7 +15,8 @@ class Build(Base):
     url: Mapped[Optional[str]]
     profession: Mapped[Profession]
     equipment_id: Mapped[int] = mapped_column(ForeignKey("equipment.id"), nullable=True)
-    equipment = relationship("Equipment", foreign_keys=[equipment_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    # Queries that need the equipment have to load it explicitly, e.g. options=[selectinload(Build.equipment)]
+    equipment = relationship("Equipment", foreign_keys=[equipment_id], lazy="raise", single_parent=True, cascade="all, delete, delete-orphan")
 
     def __str__(self):
         return f"{self.name}{' (' + self.url + ')' if self.url else ''}:\n{self.equipment}"
@@ -24,15 +25,16 @@ class Build(Base):
         return f"[{self.name}]{'(' + self.url + ')' if self.url else ''}"
 
     @staticmethod
-    async def from_profession(session: AsyncSession, profession: Profession, *, archived: bool = False):
-        stmt = select(Build).where(Build.profession == profession).where(Build.archived == archived)
+    async def from_profession(session: AsyncSession, profession: Profession, *, archived: bool = False, options: Iterable = ()):
+        stmt = select(Build).where(Build.profession == profession).where(Build.archived == archived).options(*options)
         result = await session.execute(stmt)
         instance = result.scalars().all()
         return instance
 
     @staticmethod
-    async def find(session: AsyncSession, *, id: int = None, url: str = None, name: str = None, archived: bool = False):
-        stmt = select(Build).where(Build.archived == archived)
+    async def find(session: AsyncSession, *, id: int = None, url: str = None, name: str = None, archived: bool = False,
+                   options: Iterable = ()):
+        stmt = select(Build).where(Build.archived == archived).options(*options)
         if id:
             stmt = stmt.where(Build.id == id)
         if url:
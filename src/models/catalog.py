@@ -0,0 +1,74 @@
+import datetime
+from typing import Dict, Iterable
+from sqlalchemy import DateTime, JSON, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+
+
+class CatalogEntry:
+    # Subclasses define compact(entry), it keeps the fields of an API entry that the bot uses
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    data: Mapped[dict] = mapped_column(JSON)
+    # Last time the data changed
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    # Last time the data was compared to the API
+    checked_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+
+    @classmethod
+    async def get_many(cls, session: AsyncSession, ids: Iterable[int]) -> Dict[int, dict]:
+        rows = (await session.execute(select(cls.id, cls.data).where(cls.id.in_(list(ids))))).all()
+        return {row.id: row.data for row in rows}
+
+    @classmethod
+    async def store(cls, session: AsyncSession, entries: Iterable[dict]) -> Dict[int, dict]:
+        now = datetime.datetime.utcnow()
+        entries = {entry["id"]: cls.compact(entry) for entry in entries}
+        existing = await cls.get_many(session, entries.keys())
+
+        # Only write entries that are new or changed, the others are just marked as checked
+        unchanged = []
+        for id, data in entries.items():
+            if id not in existing:
+                row = cls()
+                row.id = id
+                row.data = data
+                row.updated_at = now
+                row.checked_at = now
+                session.add(row)
+            elif existing[id] != data:
+                await session.execute(update(cls).where(cls.id == id).values(data=data, updated_at=now, checked_at=now))
+            else:
+                unchanged.append(id)
+        if unchanged:
+            await session.execute(update(cls).where(cls.id.in_(unchanged)).values(checked_at=now))
+        return entries
+
+
+class CatalogItem(CatalogEntry, Base):
+    __tablename__ = "catalog_items"
+
+    @staticmethod
+    def compact(entry: dict) -> dict:
+        details = entry.get("details", {})
+        return {
+            "id": entry["id"],
+            "name": entry["name"],
+            "rarity": entry["rarity"],
+            "level": entry["level"],
+            "type": entry["type"],
+            "details": {key: details[key] for key in ("type", "infix_upgrade", "stat_choices", "attribute_adjustment")
+                        if key in details},
+        }
+
+
+class CatalogItemStats(CatalogEntry, Base):
+    __tablename__ = "catalog_itemstats"
+
+    @staticmethod
+    def compact(entry: dict) -> dict:
+        return {
+            "id": entry["id"],
+            "name": entry["name"],
+            "attributes": entry["attributes"],
+        }
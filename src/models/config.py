@@ -1,3 +1,4 @@
+from typing import ClassVar, Dict
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column
@@ -12,6 +13,9 @@ class Config(Base):
     key: Mapped[str] = mapped_column(primary_key=True)
     value: Mapped[str] = mapped_column(nullable=False)
 
+    # Process-local copy of the config table. Loaded on startup and kept up to date by /config set and /config init
+    cache: ClassVar[Dict[ConfigKey, str]] = {}
+
     def __init__(self, key: ConfigKey, value: str):
         super(Config, self).__init__()
         self.key = key.name
@@ -63,8 +67,20 @@ class Config(Base):
         return {ConfigKey[config.key]: config.value for config in configs}
 
     @staticmethod
-    async def get_value(session: AsyncSession, key: ConfigKey):
-        return (await session.execute(select(Config).where(Config.key == key.name))).scalar().value
+    async def load(session: AsyncSession) -> None:
+        Config.cache = await Config.to_dict(session)
+
+    @staticmethod
+    def get(key: ConfigKey) -> str:
+        return Config.cache[key]
+
+    @staticmethod
+    def get_int(key: ConfigKey) -> int:
+        return int(Config.cache[key])
+
+    @staticmethod
+    def set_cached(key: ConfigKey, value: str) -> None:
+        Config.cache[key] = value
 
     @staticmethod
     async def check(session: AsyncSession) -> FeedbackGroup:
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class LogSubmissionStatus(Enum):
+    PENDING = 0
+    PROCESSING = 1
+    DONE = 2
+    FAILED = 3
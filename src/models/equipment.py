@@ -1,90 +1,114 @@
-from copy import deepcopy
-from typing import List
-from sqlalchemy import ForeignKey
+from typing import List, Dict, Optional
+from sqlalchemy import ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import JSONB
 from discord import Embed
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from models.base import Base
 from models.enums.equipment_slot import EquipmentSlot
 from models.enums.rarity import Rarity
 from models.feedback import FeedbackCollection, FeedbackGroup, Feedback, FeedbackLevel
+from models.item import Item
+from models.stats import EquipmentStats
 
 
 class Equipment(Base):
     __tablename__ = "equipment"
 
     id: Mapped[int] = mapped_column(primary_key=True)
+    # Items and stats of all slots, see items and stats below
+    data: Mapped[Optional[dict]] = mapped_column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"))
+
+    # Legacy storage with one row per item, only used to migrate old equipment (see migrations.py)
     stats_id = mapped_column(ForeignKey("equipment_stats.id"), nullable=True)
-    stats = relationship("EquipmentStats", foreign_keys=[stats_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_stats = relationship("EquipmentStats", foreign_keys=[stats_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
 
     # Armor
     helm_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    helm = relationship("Item", foreign_keys=[helm_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_helm = relationship("Item", foreign_keys=[helm_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     shoulders_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    shoulders = relationship("Item", foreign_keys=[shoulders_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_shoulders = relationship("Item", foreign_keys=[shoulders_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     coat_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    coat = relationship("Item", foreign_keys=[coat_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_coat = relationship("Item", foreign_keys=[coat_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     gloves_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    gloves = relationship("Item", foreign_keys=[gloves_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_gloves = relationship("Item", foreign_keys=[gloves_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     leggings_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    leggings = relationship("Item", foreign_keys=[leggings_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_leggings = relationship("Item", foreign_keys=[leggings_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     boots_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    boots = relationship("Item", foreign_keys=[boots_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_boots = relationship("Item", foreign_keys=[boots_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
 
     # Trinkets
     backpack_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    backpack = relationship("Item", foreign_keys=[backpack_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_backpack = relationship("Item", foreign_keys=[backpack_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     accessory_1_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    accessory_1 = relationship("Item", foreign_keys=[accessory_1_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_accessory_1 = relationship("Item", foreign_keys=[accessory_1_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     accessory_2_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    accessory_2 = relationship("Item", foreign_keys=[accessory_2_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_accessory_2 = relationship("Item", foreign_keys=[accessory_2_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     amulet_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    amulet = relationship("Item", foreign_keys=[amulet_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_amulet = relationship("Item", foreign_keys=[amulet_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     ring_1_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    ring_1 = relationship("Item", foreign_keys=[ring_1_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_ring_1 = relationship("Item", foreign_keys=[ring_1_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     ring_2_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    ring_2 = relationship("Item", foreign_keys=[ring_2_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_ring_2 = relationship("Item", foreign_keys=[ring_2_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
 
     # Weapons
     weapon_a1_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    weapon_a1 = relationship("Item", foreign_keys=[weapon_a1_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_weapon_a1 = relationship("Item", foreign_keys=[weapon_a1_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     weapon_a2_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    weapon_a2 = relationship("Item", foreign_keys=[weapon_a2_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_weapon_a2 = relationship("Item", foreign_keys=[weapon_a2_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     weapon_b1_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    weapon_b1 = relationship("Item", foreign_keys=[weapon_b1_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_weapon_b1 = relationship("Item", foreign_keys=[weapon_b1_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
     weapon_b2_id: Mapped[int] = mapped_column(ForeignKey("items.id"), nullable=True)
-    weapon_b2 = relationship("Item", foreign_keys=[weapon_b2_id], lazy="joined", single_parent=True, cascade="all, delete, delete-orphan")
+    legacy_weapon_b2 = relationship("Item", foreign_keys=[weapon_b2_id], lazy="select", single_parent=True, cascade="all, delete, delete-orphan")
+
+    def __init__(self):
+        super().__init__()
+        self.data = {"items": {}, "stats": None}
 
     def __str__(self):
         nl = "\n"
         return f"{nl.join(f'{item.slot.name}: {item}' for item in self.items)}"
 
+    def __hydrate(self) -> Dict[EquipmentSlot, "Item"]:
+        # Item objects are created once per data dict
+        if getattr(self, "_hydrated_data", None) is not self.data:
+            data = self.data or {}
+            self._hydrated_items = {EquipmentSlot[slot]: Item.from_data(item) for slot, item in data.get("items", {}).items()}
+            self._hydrated_stats = EquipmentStats.from_data(data["stats"]) if data.get("stats") else None
+            self._hydrated_data = self.data
+        return self._hydrated_items
+
     @property
     def items(self) -> List["Item"]:
-        lst = []
-        for slot in EquipmentSlot:
-            if getattr(self, slot.value):
-                lst.append(getattr(self, slot.value))
-        return lst
+        items = self.__hydrate()
+        return [items[slot] for slot in EquipmentSlot if slot in items]
 
     @property
     def weapons(self) -> List["Item"]:
-        lst = []
-        for slot in EquipmentSlot.get_weapon_slots():
-            if getattr(self, slot.value):
-                lst.append(getattr(self, slot.value))
-        return lst
+        items = self.__hydrate()
+        return [items[slot] for slot in EquipmentSlot.get_weapon_slots() if slot in items]
+
+    @property
+    def stats(self) -> "EquipmentStats":
+        self.__hydrate()
+        return self._hydrated_stats
+
+    @stats.setter
+    def stats(self, stats: "EquipmentStats"):
+        self.data = {**(self.data or {}), "stats": stats.to_data() if stats else None}
 
     def add_item(self, item: "Item"):
-        setattr(self, item.slot.value, item)
+        data = self.data or {}
+        self.data = {**data, "items": {**data.get("items", {}), item.slot.name: item.to_data()}}
 
     def get_item(self, slot: EquipmentSlot):
-        return getattr(self, slot.value)
+        return self.__hydrate().get(slot)
 
     def get_weapons_str(self) -> str:
-        return f"{self.weapon_a1.stats + ' ' + self.weapon_a1.type if self.weapon_a1 else 'None'}/" \
-               f"{self.weapon_a2.stats + ' ' + self.weapon_a2.type if self.weapon_a2 else 'None'} and " \
-               f"{self.weapon_b1.stats + ' ' + self.weapon_b1.type if self.weapon_b1 else 'None'}/" \
-               f"{self.weapon_b2.stats + ' ' + self.weapon_b2.type if self.weapon_b2 else 'None'}"
+        weapons = [self.get_item(slot) for slot in EquipmentSlot.get_weapon_slots()]
+        return f"{weapons[0].stats + ' ' + weapons[0].type if weapons[0] else 'None'}/" \
+               f"{weapons[1].stats + ' ' + weapons[1].type if weapons[1] else 'None'} and " \
+               f"{weapons[2].stats + ' ' + weapons[2].type if weapons[2] else 'None'}/" \
+               f"{weapons[3].stats + ' ' + weapons[3].type if weapons[3] else 'None'}"
 
     def get_weaponset(self, slot: EquipmentSlot):
         match slot:
@@ -99,22 +123,22 @@ class Equipment(Base):
         # Armor
         value = ""
         for slot in EquipmentSlot.get_armor_slots():
-            if getattr(self, slot.value):
-                value += f"{getattr(self, slot.value)}\n"
+            if self.get_item(slot):
+                value += f"{self.get_item(slot)}\n"
         embed.add_field(name="Armor", value=value, inline=False)
 
         # Trinkets
         value = ""
         for slot in EquipmentSlot.get_trinket_slots():
-            if getattr(self, slot.value):
-                value += f"{getattr(self, slot.value)}\n"
+            if self.get_item(slot):
+                value += f"{self.get_item(slot)}\n"
         embed.add_field(name="Trinkets", value=value, inline=False)
 
         # Weapons
         value = ""
         for slot in EquipmentSlot.get_weapon_slots():
-            if getattr(self, slot.value):
-                value += f"{getattr(self, slot.value)}\n"
+            if self.get_item(slot):
+                value += f"{self.get_item(slot)}\n"
         embed.add_field(name="Weapons", value=value, inline=False)
         return embed
 
@@ -184,46 +208,41 @@ class Equipment(Base):
 
     def compare_weapons(self, other):
         fbgs = []
-        self_cp = deepcopy(self)
-        for i in range(2):
-            for j in range(2):
-                fbg = FeedbackGroup("Weapons")
-                for slot in EquipmentSlot.get_weapon_slots():
-                    if not other.get_item(slot):
-                        # Check if the item set has an item where there should be none
-                        # In case the other gear has no items in that weapons set we can ignore (and allow) the item
-                        # In case the weapon set is not empty then there should not be any additional items, so we break
-                        if self_cp.get_item(slot):
-                            weapon_set = other.get_weaponset(slot)
-                            if weapon_set[0] or weapon_set[1]:
-                                break
-                        continue
-                    if not self_cp.get_item(slot):
-                        break
-                    if not self_cp.get_item(slot).type == other.get_item(slot).type:
-                        break
-                    fbg = self_cp.get_item(slot).check_basics(fbg, Rarity.Ascended)
-                    fbg = self_cp.get_item(slot).compare(other.get_item(slot), fbg)
-                else:
-                    # Add positive feedback
-                    if fbg.level <= FeedbackLevel.WARNING:
-                        fbg.add(Feedback(f"You are using the correct weapons", FeedbackLevel.SUCCESS))
-                        fbg.add(Feedback(f"All items are at least ascended", FeedbackLevel.SUCCESS))
-                    if fbg.level <= FeedbackLevel.SUCCESS:
-                        fbg.add(Feedback(f"Stats and upgrades of all items are correct", FeedbackLevel.SUCCESS))
-                    fbgs.append(fbg)
-
-                # Switch offhands
-                if j == 0:
-                    tmp = deepcopy(self_cp.weapon_a2)
-                    self_cp.weapon_a2 = deepcopy(self_cp.weapon_b2)
-                    self_cp.weapon_b2 = tmp
-
-            # Switch main hands
-            if i == 0:
-                self_cp = deepcopy(self)
-                self_cp.weapon_a1 = self.weapon_b1
-                self_cp.weapon_b1 = self.weapon_a1
+        weapon_slots = EquipmentSlot.get_weapon_slots()
+        weapons = tuple(self.get_item(slot) for slot in weapon_slots)
+        # Feedback for each (own weapon, build slot) pair, every pair only has to be compared once
+        feedback = {}
+        # Indices into weapons for every slot: as is, switched offhands, switched main hands, both switched
+        for permutation in [(0, 1, 2, 3), (0, 3, 2, 1), (2, 1, 0, 3), (2, 3, 0, 1)]:
+            fbg = FeedbackGroup("Weapons")
+            for slot, index in zip(weapon_slots, permutation):
+                item = weapons[index]
+                if not other.get_item(slot):
+                    # Check if the item set has an item where there should be none
+                    # In case the other gear has no items in that weapons set we can ignore (and allow) the item
+                    # In case the weapon set is not empty then there should not be any additional items, so we break
+                    if item:
+                        weapon_set = other.get_weaponset(slot)
+                        if weapon_set[0] or weapon_set[1]:
+                            break
+                    continue
+                if not item:
+                    break
+                if not item.type == other.get_item(slot).type:
+                    break
+                if (index, slot) not in feedback:
+                    item_fbg = item.check_basics(FeedbackGroup("Weapons"), Rarity.Ascended)
+                    feedback[(index, slot)] = item.compare(other.get_item(slot), item_fbg).feedback
+                for fb in feedback[(index, slot)]:
+                    fbg.add(fb)
+            else:
+                # Add positive feedback
+                if fbg.level <= FeedbackLevel.WARNING:
+                    fbg.add(Feedback(f"You are using the correct weapons", FeedbackLevel.SUCCESS))
+                    fbg.add(Feedback(f"All items are at least ascended", FeedbackLevel.SUCCESS))
+                if fbg.level <= FeedbackLevel.SUCCESS:
+                    fbg.add(Feedback(f"Stats and upgrades of all items are correct", FeedbackLevel.SUCCESS))
+                fbgs.append(fbg)
 
         if not fbgs:
             fbg = FeedbackGroup("Weapons")
@@ -1,7 +1,8 @@
+import traceback
 from enum import Enum
 import discord
 from discord import Embed
-from helpers.embeds import split_embed
+from helpers.embeds import split_embed, get_error_message
 
 
 class FeedbackLevel(Enum):
@@ -72,6 +73,14 @@ class FeedbackGroup:
         if feedback.level.value > self.level.value:
             self.level = feedback.level
 
+    @staticmethod
+    def from_error(message: str, error: Exception) -> "FeedbackGroup":
+        # Log error
+        traceback.print_exception(error)
+        fbg = FeedbackGroup(message)
+        fbg.add(Feedback(get_error_message(error), FeedbackLevel.ERROR))
+        return fbg
+
     def to_embed(self, embed: Embed = Embed(title="Feedback"), inline: bool = False) -> Embed:
         value = ""
         for fb in self.feedback:
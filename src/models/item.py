@@ -36,6 +36,26 @@ class Item(Base):
         else:
             raise Exception("Max amount of upgrades reached")
 
+    def to_data(self) -> dict:
+        return {"item_id": self.item_id, "name": self.name, "type": self.type, "level": self.level,
+                "rarity": self.rarity.name, "slot": self.slot.name, "stats": self.stats, "upgrades": self.upgrades}
+
+    @staticmethod
+    def from_data(data: dict) -> "Item":
+        item = Item()
+        item.item_id = data["item_id"]
+        item.name = data["name"]
+        item.type = data["type"]
+        item.level = data["level"]
+        item.rarity = Rarity[data["rarity"]]
+        item.slot = EquipmentSlot[data["slot"]]
+        item.stats = data["stats"]
+        item.upgrade_1 = None
+        item.upgrade_2 = None
+        for upgrade in data["upgrades"]:
+            item.add_upgrade(upgrade)
+        return item
+
     def __str__(self):
         string = f"{self.rarity} {self.stats} {self.type}"
         if self.upgrade_1 and self.upgrade_2:
@@ -1,9 +1,8 @@
 import datetime
-from sqlalchemy import DateTime, BigInteger, select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import DateTime, BigInteger, Index
 from sqlalchemy.orm import Mapped, mapped_column
+from helpers.rules import RuleIndex
 from models.base import Base
-from models.boss import Boss
 from models.enums.log_status import LogStatus
 from models.enums.pools import BossLogPool
 from models.enums.role import Role
@@ -11,12 +10,24 @@ from models.enums.role import Role
 
 class Log(Base):
     __tablename__ = "logs"
+    __table_args__ = (
+        # Duplicate boss check, tier progress and role counts (equality columns first, status is mostly a != filter)
+        Index("ix_logs_user_tier_role_encounter_status", "discord_user_id", "tier", "role", "encounter_id", "status"),
+        # Active log limit
+        Index("ix_logs_user_status", "discord_user_id", "status"),
+        # Duplicate log check
+        Index("ix_logs_url_user", "log_url", "discord_user_id"),
+        # Pending reviews on startup
+        Index("ix_logs_status", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     discord_user_id: Mapped[int] = mapped_column(BigInteger)
     tier: Mapped[int]
     role: Mapped[Role]
     log_url: Mapped[str]
+    # Needed to check the log again, older logs don't have it
+    account_name: Mapped[str] = mapped_column(nullable=True)
     encounter_id: Mapped[int]
     fight_name: Mapped[str]
     is_cm: Mapped[bool]
@@ -30,15 +41,5 @@ class Log(Base):
         super(Log, self).__init__()
         self.submitted_at = datetime.datetime.utcnow()
 
-    async def assign_pool(self, session: AsyncSession):
-        boss = (await session.execute(select(Boss).where(Boss.encounter_id == self.encounter_id).where(Boss.is_cm == self.is_cm))).scalar()
-        if boss:
-            self.assigned_pool = boss.log_pool
-        elif self.is_cm:
-            # If the log is a CM, but we don't have a CM boss, check for a non-CM boss
-            boss = (await session.execute(select(Boss).where(Boss.encounter_id == self.encounter_id))).scalar()
-            if boss:
-                self.assigned_pool = boss.log_pool
-
-        if not self.assigned_pool:
-            self.assigned_pool = BossLogPool.NOT_ALLOWED
\ No newline at end of file
+    def assign_pool(self):
+        self.assigned_pool = RuleIndex.current.get(self.encounter_id, self.is_cm).log_pool
\ No newline at end of file
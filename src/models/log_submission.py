@@ -0,0 +1,33 @@
+import datetime
+from sqlalchemy import BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from models.base import Base
+from models.enums.log_submission_status import LogSubmissionStatus
+from models.enums.role import Role
+
+
+class LogSubmission(Base):
+    __tablename__ = "log_submissions"
+    __table_args__ = (
+        # Restarting the queue
+        Index("ix_log_submissions_status", "status"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    discord_user_id: Mapped[int] = mapped_column(BigInteger)
+    tier: Mapped[int]
+    role: Mapped[Role]
+    log_url: Mapped[str]
+    # The API key is only used before queueing and never stored
+    account_name: Mapped[str]
+    status: Mapped[LogSubmissionStatus]
+    log_id: Mapped[int] = mapped_column(ForeignKey("logs.id"), nullable=True)
+    error: Mapped[str] = mapped_column(nullable=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True))
+    started_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __init__(self):
+        super(LogSubmission, self).__init__()
+        self.status = LogSubmissionStatus.PENDING
+        self.created_at = datetime.datetime.utcnow()
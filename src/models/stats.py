@@ -81,6 +81,16 @@ class EquipmentStats(Base):
             self.add_attribute(attribute["attribute"],
                                attribute["value"] + round(attribute["multiplier"] * attribute_adjustment))
 
+    def to_data(self) -> dict:
+        return {attribute.value: getattr(self, attribute.value) for attribute in Attribute}
+
+    @staticmethod
+    def from_data(data: dict) -> "EquipmentStats":
+        stats = EquipmentStats()
+        for attribute, value in data.items():
+            setattr(stats, attribute, value)
+        return stats
+
     def to_dict(self):
         return {"Power": self.power, "Precision": self.precision, "Toughness": self.toughness,
                 "Vitality": self.vitality, "Concentration": self.concentration,
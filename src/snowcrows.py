@@ -1,8 +1,11 @@
 import asyncio
+import os
+import random
+import time
+import traceback
+from typing import List, Dict, Callable, Awaitable, Iterable
 
-from bs4 import BeautifulSoup
 import aiohttp
-from soupsieve.util import lower
 
 from models.build import Build
 from models.enums.profession import Profession
@@ -11,78 +14,133 @@ from models.enums.equipment_slot import EquipmentSlot
 from models.item import Item
 from models.enums.rarity import Rarity
 from api import API
+from helpers.process_pool import run_in_process
+from helpers.sc_parser import parse_build_page, parse_build_list, SNOWCROWS_URL
 from models.stats import EquipmentStats
 
+SC_CONCURRENCY = int(os.getenv("SC_CONCURRENCY", "4"))
+SC_REQUESTS_PER_SECOND = float(os.getenv("SC_REQUESTS_PER_SECOND", "2"))
+SC_MAX_RETRIES = 5
+SC_BACKOFF_BASE = 2
+SC_BACKOFF_MAX = 60
 
-async def sc_get(url):
-    if not url.startswith("https://snowcrows.com/"):
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+# All requests to snowcrows.com share this limiter
+sc_limiter = TokenBucket(SC_REQUESTS_PER_SECOND, SC_CONCURRENCY)
+
+
+async def sc_get(url: str, session: aiohttp.ClientSession = None) -> bytes:
+    if not url.startswith(f"{SNOWCROWS_URL}/"):
         raise ValueError("Only snowcrows links are allowed")
 
-    async with aiohttp.ClientSession() as session:
+    if not session:
+        async with aiohttp.ClientSession() as session:
+            return await sc_get(url, session)
+
+    for attempt in range(SC_MAX_RETRIES + 1):
+        await sc_limiter.acquire()
         async with session.get(url) as r:
-            if "Just a moment..." in (await r.text()):
-                print(f"Cloudflare detected on {url}, waiting 10 seconds")
-                await asyncio.sleep(10)
-                return await sc_get(url)
-            return await r.read()
+            body = await r.read()
+            if r.status == 429:
+                cause = "Rate limited (status 429)"
+            elif b"Just a moment..." in body:
+                cause = "Cloudflare challenge page"
+            else:
+                return body
 
+        if attempt < SC_MAX_RETRIES:
+            delay = min(SC_BACKOFF_MAX, SC_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1)
+            print(f"{cause} on {url}, waiting {delay:.1f} seconds")
+            await asyncio.sleep(delay)
+    raise Exception(f"Snow Crows did not let us through after {SC_MAX_RETRIES} retries ({cause}): {url}")
 
-async def get_sc_build(url: str, api: API = API("")) -> Build:
-    resp = await sc_get(url)
-    sc_soup = BeautifulSoup(resp.decode("utf-8"), "html.parser")
-    table_data = sc_soup.find_all("td")
+
+def get_build_entries(page: Dict, items: Dict[int, dict]) -> List[Dict]:
+    # Entries that end up in the build, everything after the first consumable is ignored
+    entries = []
+    for entry in page["entries"]:
+        item_data = items.get(entry["item_id"])
+        if not item_data:
+            raise Exception(f"Unknown item id {entry['item_id']} on {page['url']}")
+        # TODO: handle relics
+        if item_data["type"] == "Relic":
+            continue
+        if item_data["type"] in ["Consumable", "Gizmo"]:
+            break
+        entries.append(entry)
+    return entries
+
+
+def get_stats_id(entry: Dict, item_data: dict, url: str) -> int:
+    if "infix_upgrade" in item_data["details"]:
+        return item_data["details"]["infix_upgrade"]["id"]
+    if entry["stats_id"] is not None:
+        return entry["stats_id"]
+    raise Exception(f"Unable to determine stats for {item_data['name']} on {url}: {entry['div']}")
+
+
+def needs_stat_choices(entry: Dict, item_data: dict) -> bool:
+    return (item_data["type"] != "UpgradeComponent" and "infix_upgrade" not in item_data["details"]
+            and entry["stats_id"] not in item_data["details"]["stat_choices"])
+
+
+def create_sc_build(page: Dict, items: Dict[int, dict], item_stats: Dict[int, dict]) -> Build:
+    url = page["url"]
     build = Build()
-    build.name = f"{sc_soup.find_all('h1')[0].text}"
-    build.profession = Profession[sc_soup.find_all("i", {"class": "fa-solid fa-shuffle mr-2"})[0].parent.text.strip().split(' ')[0].strip()]
+    build.name = page["name"]
+    build.profession = Profession[page["profession"]]
     build.url = url
     equipment = Equipment()
     stats = EquipmentStats()
     mh, oh, ring, accessory = 1, 1, 1, 1
-    for i in range(0, len(table_data), 2):
-        div = table_data[i].div
-
-        # Check if slot has item
-        if not div["data-armory-ids"]:
-            continue
+    for entry in get_build_entries(page, items):
+        item_data = items[entry["item_id"]]
 
         item = Item()
-        item.item_id = int(div["data-armory-ids"])
-        item_data = await api.get_item(item.item_id)
+        item.item_id = entry["item_id"]
         item.name = item_data["name"]
         item.rarity = Rarity[item_data["rarity"]]
         item.level = item_data["level"]
 
-        # TODO: handle relics
-        if item_data["type"] == "Relic":
-            continue
-
-        if item_data["type"] in ["Consumable", "Gizmo"]:
-            break
-
         # Infusion stats
         if item_data["type"] == "UpgradeComponent":
-            amount = int(table_data[i+1].p.span.text.replace("x", ""))
-            stats.add_attributes(EquipmentSlot.Helm, infix_upgrade=item_data["details"]["infix_upgrade"], multiplier=amount)
+            if entry["amount"] is None:
+                raise Exception(f"Unable to read the amount of {item_data['name']} on {url}: {entry['label']}")
+            stats.add_attributes(EquipmentSlot.Helm, infix_upgrade=item_data["details"]["infix_upgrade"], multiplier=entry["amount"])
             continue
 
-        if "infix_upgrade" in item_data["details"]:
-            stats_id = item_data["details"]["infix_upgrade"]["id"]
-        elif f"data-armory-{item.item_id}-stat" in str(div):
-            stats_id = div[f"data-armory-{item.item_id}-stat"]
-        else:
-            print(str(div))
-            raise Exception(f"Unable to determine stats for {item.name} on {url}")
-        stats_data = await api.get_item_stats(stats_id)
+        stats_id = get_stats_id(entry, item_data, url)
+        if stats_id not in item_stats:
+            raise Exception(f"Unknown stats id {stats_id} on {url}")
+        stats_data = item_stats[stats_id]
         item.stats = stats_data["name"]
 
-        upgrade_ids = []
-        if f"data-armory-{item.item_id}-upgrades" in str(div):
-            upgrade_ids = div[f"data-armory-{item.item_id}-upgrades"].split(",")
-        for upgrade_id in upgrade_ids:
-            if upgrade_id.isdecimal():
-                item.add_upgrade((await api.get_item(int(upgrade_id)))["name"])
+        for upgrade_id in entry["upgrade_ids"]:
+            if upgrade_id not in items:
+                raise Exception(f"Unknown upgrade id {upgrade_id} on {url}")
+            item.add_upgrade(items[upgrade_id]["name"])
 
-        slot = table_data[i + 1].p.span.string
+        slot = entry["label"]
         if slot == "Main Hand":
             slot = f"Weapon{'A' if mh == 1 else 'B'}1"
             mh += 1
@@ -113,9 +171,8 @@ async def get_sc_build(url: str, api: API = API("")) -> Build:
                 attributes = stats_data["attributes"]
             else:
                 for id in item_data["details"]["stat_choices"]:
-                    stats_data = await api.get_item_stats(id)
-                    if stats_data["name"] == item.stats:
-                        attributes = stats_data["attributes"]
+                    if id in item_stats and item_stats[id]["name"] == item.stats:
+                        attributes = item_stats[id]["attributes"]
                         break
                 else:
                     raise Exception(f"Invalid stats id: {url} at {item.name} (id: {item.item_id}, stat_id: {stats_id})")
@@ -127,15 +184,77 @@ async def get_sc_build(url: str, api: API = API("")) -> Build:
     return build
 
 
-async def get_sc_builds(profession: Profession):
+async def import_sc_builds(urls: Iterable[str], on_progress: Callable[[str, Exception | None], Awaitable[None]] = None,
+                           api: API = API("")) -> Dict[str, Build | Exception]:
+    urls = list(dict.fromkeys(urls))
+    results: Dict[str, Build | Exception] = {}
+    semaphore = asyncio.Semaphore(SC_CONCURRENCY)
+
+    async def report(url: str, error: Exception = None):
+        if error:
+            results[url] = error
+        if on_progress:
+            # A failed progress update must not end up as the error of the build
+            try:
+                await on_progress(url, error)
+            except Exception:
+                traceback.print_exc()
+
+    async def fetch_page(session: aiohttp.ClientSession, url: str):
+        async with semaphore:
+            try:
+                return await run_in_process(parse_build_page, url, await sc_get(url, session))
+            except Exception as e:
+                await report(url, e)
+
+    # Fetch and parse all build pages
+    async with aiohttp.ClientSession() as session:
+        pages = [page for page in await asyncio.gather(*[fetch_page(session, url) for url in urls]) if page]
+
+    # Resolve the items and stats of all builds with a few bulk requests
+    item_ids = set()
+    for page in pages:
+        for entry in page["entries"]:
+            item_ids.add(entry["item_id"])
+            item_ids.update(entry["upgrade_ids"])
+    items = await api.get_items(item_ids, strict=False)
+
+    stats_ids = set()
+    choice_ids = set()
+    for page in pages:
+        try:
+            for entry in get_build_entries(page, items):
+                item_data = items[entry["item_id"]]
+                if item_data["type"] == "UpgradeComponent":
+                    continue
+                stats_ids.add(get_stats_id(entry, item_data, page["url"]))
+                if needs_stat_choices(entry, item_data):
+                    choice_ids.update(item_data["details"]["stat_choices"])
+        except Exception:
+            # Reported when the build is created
+            pass
+    item_stats = await api.get_items_stats(stats_ids | choice_ids, strict=False)
+
+    for page in pages:
+        try:
+            results[page["url"]] = create_sc_build(page, items, item_stats)
+            await report(page["url"])
+        except Exception as e:
+            await report(page["url"], e)
+    return {url: results[url] for url in urls}
+
+
+async def get_sc_build(url: str, api: API = API("")) -> Build:
+    result = (await import_sc_builds([url], api=api))[url]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+async def get_sc_builds(profession: Profession, session: aiohttp.ClientSession = None):
     # Find all recommended and viable builds that are not kite builds or beginner builds
     links = []
     for category in ["featured"]:
-        resp = await sc_get(f"https://snowcrows.com/builds/{profession.name}?c={category}")
-        sc_soup = BeautifulSoup(resp.decode("utf-8"), "html.parser")
-        for link in sc_soup.find_all("a", href=True):
-            if (link["href"].startswith(f"/builds/raids/{lower(profession.name)}")
-                    and "kite" not in link["href"] and link["href"].count("/") > 3
-                    and category.lower() in link.find("div", {"class": "text-xs"}).text.lower()):
-                links.append("https://snowcrows.com" + link["href"])
+        resp = await sc_get(f"{SNOWCROWS_URL}/builds/{profession.name}?c={category}", session)
+        links += await run_in_process(parse_build_list, profession.name, category, resp)
     return links
@@ -1,7 +1,9 @@
-import os
+import asyncio
 from discord import Interaction
+from sqlalchemy.orm import joinedload, selectinload
 from api import API
 from database import Session
+from helpers.build_matcher import rank_builds
 from helpers.emotes import get_random_success_emote
 from models.application import Application
 from models.build import Build
@@ -14,6 +16,10 @@ from discord.ext import commands
 from helpers.logging import log_gear_check
 from helpers.embeds import generate_error_embed
 from views.review import ReviewView
+from cogs.review_interactions import send_review_message
+
+# Value of the build select option that picks the best matching build
+AUTOMATIC_BUILD = "auto"
 
 
 class SimpleDropdown(discord.ui.Select):
@@ -52,6 +58,7 @@ class ApplicationView(discord.ui.View):
         self.api = api
         self.character = character
         self.original_message = None
+        self.builds = []
 
         self.equipment_tabs_select = SimpleDropdown(placeholder="Select your equipment template")
         self.build_select = SimpleDropdown(placeholder="Select your build")
@@ -67,8 +74,14 @@ class ApplicationView(discord.ui.View):
 
         # Build select
         async with Session() as session:
-            builds = await Build.from_profession(session, Profession[character_data["profession"]])
-        for build in builds:
+            # The equipment is needed to pick the best matching build
+            self.builds = await Build.from_profession(session, Profession[character_data["profession"]],
+                                                      options=[selectinload(Build.equipment)])
+        if self.builds:
+            self.build_select.add_option(label="Automatic (best matching build)", value=AUTOMATIC_BUILD,
+                                         description="Compare your gear to all builds and use the closest one")
+        # Discord allows 25 options, the automatic option still compares against all builds
+        for build in self.builds[:25 - len(self.build_select.options)]:
             self.build_select.add_option(label=build.name, value=build.id)
         self.add_item(self.build_select)
 
@@ -81,13 +94,20 @@ class ApplicationView(discord.ui.View):
 
         # Defer to prevent timeouts
         await interaction.response.defer()
+        player_equipment, account_name = await asyncio.gather(
+            self.api.get_equipment(self.character, int(self.equipment_tabs_select.values[0])),
+            self.api.get_account_name())
+
+        build_id = self.build_select.values[0]
+        automatic = build_id == AUTOMATIC_BUILD
+        if automatic:
+            build_id = rank_builds(player_equipment, self.builds)[0][0].id
         async with Session() as session:
-            build = await Build.find(session, id=int(self.build_select.values[0]))
-            config = await Config.to_dict(session)
-        player_equipment = await self.api.get_equipment(self.character, int(self.equipment_tabs_select.values[0]))
+            build = await Build.find(session, id=int(build_id), options=[joinedload(Build.equipment)])
 
         embed = Embed(title="Gearcheck Feedback",
-                      description=f"**Comparing equipment tab {self.equipment_tabs_select.values[0]} to {build.to_link()}**\n"
+                      description=f"**Comparing equipment tab {self.equipment_tabs_select.values[0]} to {build.to_link()}"
+                                  f"{' (best matching build)' if automatic else ''}**\n"
                                   f"If your gear is not showing up correctly please equip the equipment template you selected\n\n"
                                   f"{FeedbackLevel.SUCCESS.emoji} **Success:** You have the correct gear\n"
                                   f"{FeedbackLevel.WARNING.emoji} **Warning:** Gear does not completely match the selected build\n"
@@ -102,24 +122,24 @@ class ApplicationView(discord.ui.View):
         application.equipment = player_equipment
         application.build = build
         application.discord_user_id = interaction.user.id
-        application.account_name = await self.api.get_account_name()
+        application.account_name = account_name
         application.character_name = self.character
         application.status = ApplicationStatus.from_feedback(fbc.level)
         async with Session.begin() as session:
             session.add(application)
             await session.flush()
-            await session.refresh(application)
+            # Keep the equipment and build that were just assigned for the review request
             session.expunge_all()
 
         match fbc.level:
             case FeedbackLevel.SUCCESS:
                 embed.colour = discord.Colour.green()
                 member = interaction.guild.get_member(interaction.user.id)
-                await member.add_roles(interaction.guild.get_role(int(config[ConfigKey.T1_ROLE_ID])))
-                await member.remove_roles(interaction.guild.get_role(int(config[ConfigKey.T0_ROLE_ID])))
+                await member.add_roles(interaction.guild.get_role(Config.get_int(ConfigKey.T1_ROLE_ID)))
+                await member.remove_roles(interaction.guild.get_role(Config.get_int(ConfigKey.T0_ROLE_ID)))
                 embed.add_field(name=f"{FeedbackLevel.SUCCESS.emoji} Success! You are now a Regular.", value="")
                 await self.original_message.edit(embed=embed, view=None)
-                ta_channel = interaction.guild.get_channel(int(config[ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID]))
+                ta_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID))
                 await ta_channel.send(content=f"{member.mention} Congrats on becoming a Regular!{get_random_success_emote()}")
 
             case FeedbackLevel.WARNING:
@@ -167,7 +187,8 @@ async def request_equipment_review(interaction: Interaction, application: Applic
         for fb in feedback.feedback:
             if fb.level > FeedbackLevel.SUCCESS:
                 embed = fb.to_embed(embed)
-        message = await bot.get_channel(int((await Config.get_value(session, ConfigKey.GEAR_REVIEW_CHANNEL_ID)))).send(embed=embed, view=ReviewView(bot, application.id))
+        view = ReviewView(bot, application.id)
+        message = await send_review_message(bot.get_channel(Config.get_int(ConfigKey.GEAR_REVIEW_CHANNEL_ID)), embed, view)
         application.review_message_id = message.id
         application.status = ApplicationStatus.WAITING_FOR_REVIEW
         session.add(application)
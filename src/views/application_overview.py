@@ -1,3 +1,4 @@
+import asyncio
 from discord import Interaction
 from sqlalchemy import select
 from database import Session
@@ -22,21 +23,20 @@ class ApplicationOverview(discord.ui.View):
     async def apply_t1(self, interaction: discord.Interaction, button: discord.ui.Button):
         # Check if user already has an open application
         async with Session.begin() as session:
-            stmt = select(Application).where(Application.discord_user_id == interaction.user.id) \
+            stmt = select(Application.id).where(Application.discord_user_id == interaction.user.id) \
                 .where(Application.status == ApplicationStatus.WAITING_FOR_REVIEW)
-            application = (await session.execute(stmt)).scalar()
-            if application:
+            application_id = (await session.execute(stmt)).scalar()
+            if application_id:
                 response = await interaction.response.send_message(
                     ephemeral=True,
                     content="You already have an open application. Please wait until it has been reviewed.\n\n"
                             "If you want you can close your application by clicking the button below.",
-                    view=CloseApplicationView(self.bot, application.id))
+                    view=CloseApplicationView(self.bot, application_id))
                 return
-            config = await Config.to_dict(session)
 
         # Check if user already has role
         for role in interaction.user.roles:
-            if role.id in [int(config[ConfigKey.T1_ROLE_ID]), int(config[ConfigKey.T2_ROLE_ID]), int(config[ConfigKey.T3_ROLE_ID])]:
+            if role.id in [Config.get_int(ConfigKey.T1_ROLE_ID), Config.get_int(ConfigKey.T2_ROLE_ID), Config.get_int(ConfigKey.T3_ROLE_ID)]:
                 await interaction.response.send_message(ephemeral=True, content="You are already a Regular or above.")
                 return
         await interaction.response.send_modal(ApplicationModal(self.bot))
@@ -67,7 +67,7 @@ class CloseApplicationView(discord.ui.View):
             application.status = ApplicationStatus.CLOSED_BY_APPLICANT
 
             # Delete review message
-            rr_channel = interaction.guild.get_channel(int(await Config.get_value(session, ConfigKey.GEAR_REVIEW_CHANNEL_ID)))
+            rr_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.GEAR_REVIEW_CHANNEL_ID))
             await (await rr_channel.fetch_message(application.review_message_id)).delete()
             application.review_message_id = None
 
@@ -107,7 +107,15 @@ class ApplicationModal(discord.ui.Modal, title="Regular Application"):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        if str(self.character) in await api.get_characters():
+        # Run the remaining checks concurrently. They only depend on a valid API key
+        characters, mastery_feedback, kp_feedback = await asyncio.gather(
+            api.get_characters(), api.check_mastery(), api.check_kp(1), return_exceptions=True)
+
+        # Check character
+        if isinstance(characters, Exception):
+            embed = FeedbackGroup.from_error("Characters", characters).to_embed(embed)
+            failed_registration = True
+        elif str(self.character) in characters:
             embed.add_field(name=f"{FeedbackLevel.SUCCESS.emoji} Character '{self.character}' found", value="",
                             inline=False)
         else:
@@ -116,13 +124,15 @@ class ApplicationModal(discord.ui.Modal, title="Regular Application"):
             failed_registration = True
 
         # Check masteries
-        mastery_feedback = await api.check_mastery()
+        if isinstance(mastery_feedback, Exception):
+            mastery_feedback = FeedbackGroup.from_error("Masteries", mastery_feedback)
         embed = mastery_feedback.to_embed(embed)
         if mastery_feedback.level == FeedbackLevel.ERROR:
             failed_registration = True
 
         # Check KP
-        kp_feedback = await api.check_kp(1)
+        if isinstance(kp_feedback, Exception):
+            kp_feedback = FeedbackGroup.from_error("Killproof", kp_feedback)
         embed = kp_feedback.to_embed(embed)
         if kp_feedback.level == FeedbackLevel.ERROR:
             failed_registration = True
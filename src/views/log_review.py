@@ -5,6 +5,7 @@ from discord.ui import View, Modal
 from sqlalchemy import select, func, distinct
 
 from database import Session
+from helpers.embeds import invalidate_progress
 from helpers.emotes import get_random_success_emote
 from models.config import Config
 from models.enums.config_key import ConfigKey
@@ -20,9 +21,9 @@ class LogReviewView(View):
         self.bot = bot
         self.log_id = log_id
         self.add_item(CallbackButton(self.accept, label="Accept", style=ButtonStyle.green,
-                                     custom_id=f"{self.bot.user.id}-application-{log_id}:accept"))
+                                     custom_id=f"{self.bot.user.id}-log-{log_id}:accept"))
         self.add_item(CallbackButton(self.deny, label="Deny", style=ButtonStyle.red,
-                                     custom_id=f"{self.bot.user.id}-application-{log_id}:deny"))
+                                     custom_id=f"{self.bot.user.id}-log-{log_id}:deny"))
     async def accept(self, interaction: Interaction):
         await interaction.response.send_modal(LogReviewModal(self.bot, LogStatus.REVIEW_ACCEPTED, self.log_id, self))
 
@@ -64,27 +65,28 @@ class LogReviewModal(Modal, title="Log review"):
             # Send feedback message
             emote = ""
             role_assignment_text = ""
-            ta_channel = interaction.guild.get_channel(int(await Config.get_value(session, ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID)))
-            rr_channel = interaction.guild.get_channel(int(await Config.get_value(session, ConfigKey.LOG_REVIEW_CHANNEL_ID)))
-            member = interaction.guild.get_member(log.discord_user_id)
+            ta_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID))
+            rr_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.LOG_REVIEW_CHANNEL_ID))
+            discord_user_id = log.discord_user_id
+            member = interaction.guild.get_member(discord_user_id)
             if self.status == LogStatus.REVIEW_ACCEPTED:
                 roles = []
                 stmt = select(func.count(Log.id)).where(Log.discord_user_id == log.discord_user_id)\
                     .where(Log.status == LogStatus.REVIEW_ACCEPTED).where(Log.tier == log.tier)\
                     .where(Log.role == log.role)
                 if log.tier == 2 and (await session.execute(stmt)).scalar() + 1 >= 2:
-                    roles.append(interaction.guild.get_role(int((await session.get(Config, ConfigKey.T2_ROLE_ID.name)).value)))
-                    old_role = interaction.guild.get_role(int((await session.get(Config, ConfigKey.T1_ROLE_ID.name)).value))
+                    roles.append(interaction.guild.get_role(Config.get_int(ConfigKey.T2_ROLE_ID)))
+                    old_role = interaction.guild.get_role(Config.get_int(ConfigKey.T1_ROLE_ID))
                 elif log.tier == 3:
                     # After 3 different T3 bosses, assign T3 role and remove T2 role
                     stmt_t3 = select(func.count(distinct(Log.encounter_id))).where(Log.discord_user_id == log.discord_user_id)\
                     .where((Log.status == LogStatus.REVIEW_ACCEPTED) | (Log.id == log.id)).where(Log.tier == log.tier)
                     if(await session.execute(stmt_t3)).scalar() >= 3:
-                        roles.append(interaction.guild.get_role(int((await session.get(Config, ConfigKey.T3_ROLE_ID.name)).value)))
-                        old_role = interaction.guild.get_role(int((await session.get(Config, ConfigKey.T2_ROLE_ID.name)).value))
+                        roles.append(interaction.guild.get_role(Config.get_int(ConfigKey.T3_ROLE_ID)))
+                        old_role = interaction.guild.get_role(Config.get_int(ConfigKey.T2_ROLE_ID))
                     # After 3 T3 logs of the same role, assign role
                     if (await session.execute(stmt)).scalar() + 1 >= 3:
-                        roles.append(interaction.guild.get_role(int((await session.get(Config, log.role.get_config_key().name)).value)))
+                        roles.append(interaction.guild.get_role(Config.get_int(log.role.get_config_key())))
 
                 if roles:
                     for role in roles:
@@ -109,3 +111,4 @@ class LogReviewModal(Modal, title="Log review"):
                                  f"**Tier:** {log.tier}\n**Role:** {log.role}\n**Log:** {log.log_url}\n")
             embed.add_field(name="Feedback", value=ta_message.jump_url)
             await log_to_channel(self.bot, embed)
+        invalidate_progress(discord_user_id)
@@ -2,9 +2,11 @@ import discord
 from discord import Interaction, ButtonStyle, Embed
 from discord.ext import commands
 from discord.ui import View, Modal
+from sqlalchemy.orm import joinedload
 from database import Session
 from helpers.emotes import get_random_success_emote
 from models.application import Application
+from models.build import Build
 from models.config import Config
 from models.enums.application_status import ApplicationStatus
 from models.enums.config_key import ConfigKey
@@ -32,7 +34,8 @@ class ReviewView(View):
 
     async def compare_stats(self, interaction: Interaction):
         async with Session.begin() as session:
-            application = await session.get(Application, self.application_id)
+            application = await session.get(Application, self.application_id, options=[
+                joinedload(Application.equipment), joinedload(Application.build).joinedload(Build.equipment)])
             player_stats = application.equipment.stats.to_dict()
             build_stats = application.build.equipment.stats.to_dict()
             attributes, attributes_player, attributes_build = "", "", ""
@@ -89,12 +92,12 @@ class ReviewModal(Modal, title="Regular Application"):
 
             # Add role and send feedback message
             emote = ""
-            ta_channel = interaction.guild.get_channel(int(await Config.get_value(session, ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID)))
-            rr_channel = interaction.guild.get_channel(int(await Config.get_value(session, ConfigKey.GEAR_REVIEW_CHANNEL_ID)))
+            ta_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.TIER_ASSIGNMENT_CHANNEL_ID))
+            rr_channel = interaction.guild.get_channel(Config.get_int(ConfigKey.GEAR_REVIEW_CHANNEL_ID))
             member = interaction.guild.get_member(application.discord_user_id)
             if self.status == ApplicationStatus.REVIEW_ACCEPTED:
-                role = interaction.guild.get_role(int(await Config.get_value(session, ConfigKey.T1_ROLE_ID)))
-                old_role = interaction.guild.get_role(int(await Config.get_value(session, ConfigKey.T0_ROLE_ID)))
+                role = interaction.guild.get_role(Config.get_int(ConfigKey.T1_ROLE_ID))
+                old_role = interaction.guild.get_role(Config.get_int(ConfigKey.T0_ROLE_ID))
                 emote = get_random_success_emote()
                 await member.add_roles(role)
                 await member.remove_roles(old_role)
@@ -1,4 +1,4 @@
-import aiohttp
+import asyncio
 import discord
 from discord import Interaction
 from discord.ext import commands
@@ -6,17 +6,12 @@ from sqlalchemy import select, func
 from api import API
 from database import Session
 from helpers.custom_embed import CustomEmbed
-from helpers.embeds import generate_error_embed, get_log_embed
-from helpers.log_checks import check_log
-from helpers.logging import log_to_channel
-from models.config import Config
-from models.enums.config_key import ConfigKey
+from helpers.embeds import generate_error_embed
 from models.enums.log_status import LogStatus
 from models.enums.role import Role
-from models.feedback import FeedbackLevel
+from models.feedback import FeedbackLevel, FeedbackGroup
 import re
 from models.log import Log
-from views.log_review import LogReviewView
 
 
 class SubmitLogModal(discord.ui.Modal, title="Submit log"):
@@ -64,72 +59,30 @@ class SubmitLogModal(discord.ui.Modal, title="Submit log"):
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
+        # Check KP and get the account name concurrently. They only depend on a valid API key
+        kp_feedback, account_name = await asyncio.gather(api.check_kp(self.tier), api.get_account_name(), return_exceptions=True)
+        if isinstance(account_name, Exception):
+            raise account_name
+
         # Check KP
-        kp_feedback = await api.check_kp(self.tier)
+        if isinstance(kp_feedback, Exception):
+            kp_feedback = FeedbackGroup.from_error("Killproof", kp_feedback)
         embed = kp_feedback.to_embed(embed)
         if kp_feedback.level == FeedbackLevel.ERROR:
             await interaction.followup.send(embed=embed, ephemeral=True)
             return
 
-        # Get json data from dps.report
-        error = ""
-        async with aiohttp.ClientSession() as session:
-            async with session.get("https://dps.report/getJson?permalink=" + str(self.log_url)) as r:
-                if r.status == 200:
-                    try:
-                        log_json = await r.json()
-                    except Exception as e:
-                        error = f"{str(self.log_url)}\n{e}"
-                else:
-                    error = f"{str(self.log_url)}\n{r.status}: {await r.text()}"
-
-        if error:
-            embed.add_field(name=f"{FeedbackLevel.ERROR.emoji} Error while parsing log", value=error,
-                            inline=False)
-            await log_to_channel(self.bot, embed)
-            await interaction.followup.send(embed=embed, ephemeral=True)
-            return
-
-        # Create log
-        log = Log()
-        log.discord_user_id = interaction.user.id
-        log.tier = self.tier
-        log.role = self.role
-        log.encounter_id = log_json["eiEncounterID"]
-        log.fight_name = log_json["fightName"]
-        log.is_cm = log_json["isCM"]
-        log.log_url = str(self.log_url)
-
-        # Check log
-        fbc = await check_log(log_json, await api.get_account_name(), self.tier, interaction.user.id, str(self.log_url), log)
-        fbc.to_embed(embed)
-        if fbc.level == FeedbackLevel.SUCCESS:
-            embed.add_field(name="Log successfully submitted for manual review", value="", inline=False)
-
-        log.status = LogStatus.DENIED if fbc.level == FeedbackLevel.ERROR else LogStatus.WAITING_FOR_REVIEW
-
-        async with Session.begin() as session:
-            session.add(log)
-            await session.flush()
-            await session.refresh(log)
-
-            if log.status == LogStatus.DENIED:
-                await interaction.followup.send(embed=embed, ephemeral=True)
-                await log_to_channel(self.bot, embed)
-                return
-
-            # Create review message
-            review_embed = get_log_embed(str(self.log_url), log_json, interaction.user, await api.get_account_name(), self.role, self.tier)
-            fbc.to_embed(review_embed)
-
-            message = await self.bot.get_channel(int(await Config.get_value(session, ConfigKey.LOG_REVIEW_CHANNEL_ID)))\
-                .send(embed=review_embed, view=LogReviewView(self.bot, log.id))
-            log.review_message_id = message.id
-            session.add(log)
+        # The log is downloaded and checked in the background, the result is sent as another followup
+        position = await self.bot.get_cog("LogQueue").enqueue(interaction, self.tier, self.role, str(self.log_url), account_name)
+        if position is None:
+            embed.add_field(name=f"{FeedbackLevel.ERROR.emoji} You already have a log in the queue. Please wait for its result",
+                            value="", inline=False)
+        else:
+            embed.colour = FeedbackLevel.WARNING.colour
+            embed.add_field(name=f"Log queued for checking (position {position})",
+                            value="You will get the result here or as a direct message", inline=False)
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-
-
     async def on_error(self, interaction: Interaction, error: Exception) -> None:
         await interaction.followup.send(embed=generate_error_embed(error), ephemeral=True)
         # Log error